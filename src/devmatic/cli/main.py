@@ -18,10 +18,10 @@ import ctypes
 import hashlib
 import asyncio
 import aiohttp
-import shutil
 import io
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+from typing import List
 
 # Rich imports
 from rich.console import Console
@@ -32,15 +32,38 @@ from rich.status import Status
 from rich import box
 
 # DevMatic imports
-from utils.format import format_size, format_time
-from utils.download import download_file
+from utils.format import format_size, format_time, parse_size
+from utils.download import download_file_async, configure_download_limits
+from utils.http_client import get_http_client
+from utils.archive import is_tar_archive, member_filter
+from utils.cache import lookup_cached_file
+from utils.catalog import configure_catalog
+from utils.manifest import load_install_manifest, remove_install_manifest
+from utils.staging import discard_tree
+from utils.filestore import configure_file_store, collect_garbage
+from utils.verify import verify_sdks
+from utils.env import env_batch
+from utils.store import (
+    sdk_home,
+    installed_versions,
+    is_version_installed,
+    current_version,
+    set_current_version,
+    installed_sdks,
+    stale_versions,
+    remove_version,
+    remove_sdk_store
+)
 from utils.sdk import (
     ensure_directories_and_files,
-    fetch_apps_data,
     fetch_sdk_data,
-    show_sdk_menu,
+    show_app_menu,
     install_sdk,
+    install_sdk_streaming,
+    install_sdk_remote,
+    configure_remote_installs,
     update_env_file,
+    update_local_sdk_version,
     remove_sdk_version,
     DOWNLOAD_DIR,
     SDK_DIR
@@ -49,12 +72,142 @@ from utils.sdk import (
 app = typer.Typer()
 console = Console()
 
+EXTRACT_WORKERS = 2  # Archives extracted at the same time
+
+def remove_sdk(name, version):
+    """Remove an installed SDK; the environment is regenerated by the caller"""
+    try:
+        # Remove every installed version, and a pre-store installation if present
+        legacy_dir = DOWNLOAD_DIR / name
+        if sdk_home(name).exists() or legacy_dir.exists():
+            remove_sdk_store(name)
+            discard_tree(legacy_dir)
+            console.print(f"[green]✓ Removed installation directory for {name}[/green]")
+        
+        # Remove from version tracking
+        remove_sdk_version(name)
+        remove_install_manifest(name)
+        console.print(f"[green]Successfully removed {name} v{version}[/green]")
+        
+    except Exception as e:
+        console.print(f"[red]Failed to remove {name}: {e}[/red]")
+
+async def install_pipeline(installs, sdk_catalog, progress, executor):
+    """Download every selected SDK at once and extract each as soon as it arrives
+
+    Downloads share the HTTP client's connection pool and the global download
+    budget; SDKs selected first get priority. Extraction runs on the executor
+    so it overlaps with the downloads still in flight.
+
+    Returns a list of (name, size) for the SDKs installed successfully.
+    """
+    session = await get_http_client().get_session()
+    loop = asyncio.get_running_loop()
+    
+    async def process(priority, action, name, version):
+        sdk = sdk_catalog.get(name, version)
+        if not sdk:
+            console.print(f"[red]Error: SDK data not found for {name}[/red]")
+            return None
+            
+        try:
+            # A version kept in the store only needs to become the active one
+            if is_version_installed(name, version):
+                start_time = time.time()
+                set_current_version(name, version)
+                update_local_sdk_version(name, version)
+                console.print(f"[green]Switched {name} to installed v{version}[/green] [dim](took {format_time(time.time() - start_time)})[/dim]")
+                return name, 0
+            
+            select = member_filter(sdk.include, sdk.exclude)
+            cached = lookup_cached_file(sdk.url, sdk.hash)
+            result = None
+            
+            # Zips with a file filter, or upgrading an installed version, only fetch the members they need
+            active = current_version(name)
+            upgradable = action == "update" and active and load_install_manifest(name, active) is not None
+            if (select or upgradable) and sdk.url.lower().endswith('.zip') and not cached:
+                result = await install_sdk_remote(name, sdk.url, version, select, session=session,
+                                                  progress=progress, priority=priority, update_env=False,
+                                                  file_hash=sdk.hash)
+            # Tar archives not already cached are extracted while they download
+            elif is_tar_archive(sdk.url) and not sdk.mirrors and not cached:
+                result = await install_sdk_streaming(
+                    name, sdk.url, version, sdk.hash,
+                    session=session, progress=progress, priority=priority, update_env=False, select=select
+                )
+            
+            if result is not None:
+                success, size, install_time = result
+            else:
+                # Prepare download
+                filename = Path(sdk.url).name
+                destination = DOWNLOAD_DIR / filename
+                
+                if not await download_file_async(sdk.url, destination, sdk.name, sdk.hash,
+                                                 session=session, progress=progress, priority=priority,
+                                                 mirrors=sdk.mirrors):
+                    console.print(f"[red]Failed to download {name}[/red]")
+                    return None
+                    
+                # Install SDK on a worker while other downloads continue
+                success, size, install_time = await loop.run_in_executor(
+                    executor,
+                    partial(install_sdk, name, destination, version, update_env=False, progress=progress,
+                            select=select, source_url=sdk.url)
+                )
+            if not success:
+                console.print(f"[red]Failed to {action} {name}[/red]")
+                return None
+                
+            action_text = "installed" if action == "install" else "upgraded"
+            console.print(f"[green]Successfully {action_text} {name} to v{version}[/green] [dim](took {format_time(install_time)})[/dim]")
+            return name, size
+            
+        except Exception as e:
+            console.print(f"[red]Error processing {name}: {e}[/red]")
+            return None
+    
+    results = await asyncio.gather(*(process(priority, action, name, version)
+                                     for priority, (action, name, version, _) in enumerate(installs)))
+    return [result for result in results if result]
+
+def process_actions(actions, sdk_catalog):
+    """Run the selected actions and regenerate the environment once
+
+    Returns a list of (name, size) for the SDKs installed successfully.
+    """
+    removals = [action for action in actions if action[0] == "remove"]
+    installs = [action for action in actions if action[0] != "remove"]
+    
+    # Environment updates requested along the way are written once, when the batch ends
+    with env_batch():
+        for _, name, version, _ in removals:
+            remove_sdk(name, version)
+        
+        installed = []
+        if installs:
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[bold blue]{task.description:<20}"),
+                BarColumn(bar_width=20),
+                DownloadColumn(),
+                TransferSpeedColumn(),
+                console=console,
+                transient=True,
+                expand=False,
+            ) as progress, ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+                installed = get_http_client().run(install_pipeline(installs, sdk_catalog, progress, executor))
+        
+        if removals or installed:
+            update_env_file()
+            
+    return installed
+
 def interactive():
     """Interactive SDK installer"""
     try:
         session_start = time.time()
-        total_size = 0
-        installed_count = 0
         
         # Initialize environment
         with Status("[bold blue]Initializing DevMatic...", spinner="dots") as status:
@@ -62,82 +215,17 @@ def interactive():
             status.update("[bold green]✓ Environment initialized")
             time.sleep(0.5)  # Small delay for visual feedback
         
-        # Get apps data and show selection menu
-        apps_data = fetch_apps_data()
-        actions = show_sdk_menu(apps_data)
+        # Pick an app, then confirm the SDKs it needs
+        actions = show_app_menu()
         if not actions:
             console.print("\n[yellow]No actions selected. Exiting...[/yellow]")
             return
         
         # Process selected actions
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[bold blue]{task.description}"),
-            BarColumn(),
-            TextColumn("[cyan]{task.completed}/{task.total}"),
-            console=console,
-            transient=True
-        ) as progress:
-            task = progress.add_task("[cyan]Processing actions...", total=len(actions))
-            
-            for action, name, version, local_version in actions:
-                if action == "remove":
-                    try:
-                        # Remove installation directory
-                        install_dir = DOWNLOAD_DIR / name
-                        if install_dir.exists():
-                            shutil.rmtree(install_dir)
-                            console.print(f"[green]✓ Removed installation directory for {name}[/green]")
-                        
-                        # Remove from version tracking and update environment
-                        if remove_sdk_version(name) and update_env_file():
-                            console.print(f"[green]Successfully removed {name} v{version}[/green]")
-                        else:
-                            console.print(f"[yellow]Warning: Partial removal of {name} - some components may remain[/yellow]")
-                            
-                    except Exception as e:
-                        console.print(f"[red]Failed to remove {name}: {e}[/red]")
-                        
-                else:  # install or upgrade
-                    try:
-                        # Get SDK data
-                        sdk_data = get_sdk_data()
-                        sdk = next((s for s in sdk_data if s["name"] == name), None)
-                        
-                        if not sdk:
-                            console.print(f"[red]Error: SDK data not found for {name}[/red]")
-                            continue
-                        
-                        # Prepare download
-                        filename = Path(sdk["url"]).name
-                        destination = DOWNLOAD_DIR / filename
-                        file_hash = sdk.get("hash")
-                        
-                        # Download SDK
-                        console.print(f"\n[bold blue]Processing {name}...[/bold blue]")
-                        if download_file(sdk["url"], destination, sdk["name"], file_hash):
-                            # Install SDK
-                            success, size, install_time = install_sdk(name, destination, version)
-                            
-                            if success:
-                                action_text = "installed" if action == "install" else "upgraded"
-                                console.print(f"[green]Successfully {action_text} {name} to v{version}[/green] [dim](took {format_time(install_time)})[/dim]")
-                                total_size += size
-                                installed_count += 1
-                                
-                                # Update environment after successful installation
-                                if not update_env_file():
-                                    console.print("[yellow]Warning: Failed to update environment variables[/yellow]")
-                            else:
-                                console.print(f"[red]Failed to {action} {name}[/red]")
-                        else:
-                            console.print(f"[red]Failed to download {name}[/red]")
-                            
-                    except Exception as e:
-                        console.print(f"[red]Error processing {name}: {e}[/red]")
-                        
-                progress.advance(task)
-                console.print()  # Add spacing between actions
+        sdk_catalog = fetch_sdk_data()
+        installed = process_actions(actions, sdk_catalog)
+        installed_count = len(installed)
+        total_size = sum(size for _, size in installed)
         
         # Show session summary
         session_time = time.time() - session_start
@@ -159,9 +247,70 @@ def interactive():
         console.print(f"\n[bold red]Error: {str(e)}[/bold red]")
         console.print("[yellow]Please report this issue on GitHub[/yellow]")
 
+@app.callback(invoke_without_command=True)
+def main(
+    ctx: typer.Context,
+    max_bandwidth: str = typer.Option(None, "--max-bandwidth", help="Total download bandwidth limit, e.g. 5M or 500K per second"),
+    max_connections: int = typer.Option(None, "--max-connections", help="Maximum connections across all downloads"),
+    dedup: bool = typer.Option(None, "--dedup/--no-dedup", help="Share identical files between SDK installs through hardlinks"),
+    offline: bool = typer.Option(None, "--offline", help="Use the cached catalogs without contacting the server"),
+    trust_zip_crc: bool = typer.Option(None, "--trust-zip-crc/--no-trust-zip-crc",
+                                       help="Fetch only the needed files of zips with a catalog SHA256, checking them by CRC32 alone")
+):
+    """DevMatic SDK manager"""
+    configure_download_limits(
+        max_connections=max_connections,
+        max_bandwidth=parse_size(max_bandwidth) if max_bandwidth else None
+    )
+    configure_file_store(dedup)
+    configure_catalog(offline)
+    configure_remote_installs(trust_zip_crc)
+    if ctx.invoked_subcommand is None:
+        interactive()
+
+@app.command()
+def use(
+    name: str = typer.Argument(..., help="SDK name"),
+    version: str = typer.Argument(..., help="Installed version to make active")
+):
+    """Switch an SDK to another installed version"""
+    versions = installed_versions(name)
+    if version not in versions:
+        available = ", ".join(versions) if versions else "none"
+        console.print(f"[red]{name} v{version} is not installed (installed: {available})[/red]")
+        raise typer.Exit(1)
+        
+    set_current_version(name, version)
+    update_local_sdk_version(name, version)
+    if not update_env_file():
+        console.print("[yellow]Warning: Failed to update environment variables[/yellow]")
+    console.print(f"[green]✓ {name} now uses v{version}[/green]")
+
+@app.command()
+def gc(
+    keep: int = typer.Option(1, "--keep", help="Inactive versions of each SDK to keep, most recently installed first")
+):
+    """Delete old SDK versions and deduplicated files no installed SDK uses any more"""
+    for name in installed_sdks():
+        for version in stale_versions(name, keep):
+            remove_version(name, version)
+            remove_install_manifest(name, version)
+            console.print(f"[green]✓ Removed {name} v{version}[/green]")
+    collect_garbage()
+
+@app.command()
+def verify(
+    names: List[str] = typer.Argument(None, help="SDKs to check, all installed SDKs by default"),
+    deep: bool = typer.Option(False, "--deep", help="Re-hash every file instead of comparing size and modification time"),
+    repair: bool = typer.Option(False, "--repair", help="Restore damaged files from the SDK's archive")
+):
+    """Check installed SDKs for missing or modified files"""
+    if not verify_sdks(names, deep=deep, repair=repair):
+        raise typer.Exit(1)
+
 def cli():
     """Main CLI function"""
-    interactive()
+    app()
 
 if __name__ == "__main__":
     cli()
@@ -11,22 +11,6 @@ import time
 
 console = Console()
 
-def load_sdk_env():
-    """Load SDK environment variables from sdk.env"""
-    env_file = Path("sdk.env")
-    if not env_file.exists():
-        console.print("[red]sdk.env file not found[/red]")
-        return {}
-        
-    env_vars = {}
-    with open(env_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#'):
-                key, value = line.split('=', 1)
-                env_vars[key.strip()] = value.strip()
-    return env_vars
-
 def get_github_desktop_db_path():
     """Get GitHub Desktop's database path"""
     system = platform.system()
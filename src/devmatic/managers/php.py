@@ -7,24 +7,11 @@ from rich.console import Console
 import time
 import shutil
 
-console = Console()
+from ..utils.env import load_sdk_env, sdk_tool
 
-def load_sdk_env():
-    """Load SDK environment variables from sdk.env"""
-    env_file = Path("sdk.env")
-    if not env_file.exists():
-        console.print("[red]sdk.env file not found[/red]")
-        return {}
-        
-    env_vars = {}
-    with open(env_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#'):
-                key, value = line.split('=', 1)
-                env_vars[key.strip()] = value.strip()
-    return env_vars
+console = Console()
 
+@sdk_tool
 def find_php():
     """Find PHP executables using sdk.env"""
     env_vars = load_sdk_env()
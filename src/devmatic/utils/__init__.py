@@ -6,10 +6,13 @@ Provides download and formatting utilities for the DevMatic CLI.
 
 from .format import format_size, format_time
 from .download import download_file_async, verify_file_hash
+from .http_client import HttpClient, get_http_client
 
 __all__ = [
     'format_size',
     'format_time',
     'download_file_async',
-    'verify_file_hash'
+    'verify_file_hash',
+    'HttpClient',
+    'get_http_client'
 ]
\ No newline at end of file
@@ -0,0 +1,960 @@
+"""
+Archive utilities for DevMatic
+
+Provides functions for extracting SDK archives, including tar archives
+streamed straight from the network and zip members fetched individually
+with range requests.
+"""
+
+import io
+import os
+import zlib
+import queue
+import struct
+import asyncio
+import fnmatch
+import threading
+import uuid
+import shutil
+import hashlib
+import tarfile
+import zipfile
+import aiohttp
+from pathlib import Path, PurePosixPath
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rich.console import Console
+from rich.progress import Progress
+
+from .download import (
+    get_download_budget,
+    probe_remote_file,
+    RangeNotSupported,
+    _is_retryable,
+    _retry_delay,
+    RANGE_RETRIES
+)
+from .cache import store_cached_file
+from .format import format_size
+from .paths import CACHE_DIR
+
+console = Console()
+
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+STREAM_QUEUE_SIZE = 64  # Network chunks buffered ahead of the extractor
+ZIP_TAIL_SIZE = 64 * 1024 + 22  # Largest possible end of central directory record
+ZIP_COALESCE_GAP = 256 * 1024  # Unwanted bytes worth reading to save a request
+ZIP_MAX_SPAN = 16 * 1024 * 1024  # Largest range covering several small members
+ZIP_CONNECTIONS = 8  # Concurrent member range requests per archive
+COPY_BUFFER_SIZE = 1024 * 1024  # Bytes copied at a time when extracting
+EXTRACT_THREADS = min(8, (os.cpu_count() or 1) + 4)  # File creation is I/O bound, so more threads than cores
+EXTRACT_BATCH_SIZE = 4 * 1024 * 1024  # Bytes of small members per extraction task
+EXTRACT_BATCH_FILES = 256  # Small members per extraction task
+SDK_ROOT_MARKERS = ('.exe', '.dll', '.bat', '.cmd')  # Files that mark a folder as the SDK root
+
+def is_tar_archive(name: str) -> bool:
+    """Check whether a file name or URL points at a tar archive"""
+    return name.lower().endswith(TAR_SUFFIXES)
+
+def is_safe_member(name: str) -> bool:
+    """Reject absolute paths and paths escaping the install directory"""
+    path = PurePosixPath(name.replace('\\', '/'))
+    return not path.is_absolute() and '..' not in path.parts and ':' not in name
+
+def member_filter(include: list = None, exclude: list = None):
+    """Build a predicate selecting archive members by glob patterns
+
+    Patterns come from an SDK's "include" and "exclude" catalog fields and
+    are matched against member paths below the SDK root folder (see
+    find_sdk_root). A pattern matching a directory also selects everything
+    in it. Returns None when the SDK declares no filter.
+    """
+    if not include and not exclude:
+        return None
+        
+    def matches(path: str, patterns: list) -> bool:
+        parts = path.rstrip('/').split('/')
+        prefixes = ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+        return any(fnmatch.fnmatch(prefix, pattern.rstrip('/')) for pattern in patterns for prefix in prefixes)
+        
+    def select(path: str) -> bool:
+        if include and not matches(path, include):
+            return False
+        return not (exclude and matches(path, exclude))
+    return select
+
+def find_sdk_root(names: list) -> str:
+    """Find the folder holding the SDK itself from an archive's member names
+
+    Descends through folders that are the only entry at their level,
+    stopping at one that directly contains executables or has several
+    entries. Returns that folder as a member path prefix, '' for the
+    archive's top level.
+    """
+    entries = [parts for parts in (PurePosixPath(name.replace('\\', '/')).parts for name in names) if parts]
+    depth = 0
+    while entries:
+        if len({parts[depth] for parts in entries}) != 1:
+            break
+        below = [parts for parts in entries if len(parts) > depth + 1]
+        if not below:
+            break  # A single file, or an empty folder
+        entries = below
+        depth += 1
+        if any(len(parts) == depth + 1 and parts[depth].lower().endswith(SDK_ROOT_MARKERS) for parts in entries):
+            break
+    return '/'.join(entries[0][:depth]) if depth else ''
+
+def _hoist_root(install_dir: Path, root: str):
+    """Make the SDK root folder found after extraction the install directory's content
+
+    Only renames: the root moves aside, its empty wrapper folders are
+    removed, and its entries move up one by one.
+    """
+    if not root:
+        return
+    aside = install_dir / f".{uuid.uuid4().hex[:8]}.root"
+    os.replace(install_dir / root, aside)
+    wrapper = install_dir / PurePosixPath(root).parts[0]
+    if wrapper.exists():
+        shutil.rmtree(wrapper)
+    for item in aside.iterdir():
+        os.replace(item, install_dir / item.name)
+    aside.rmdir()
+
+def plan_zip_install(members: list, install_dir: Path, select=None, previous: dict = None,
+                     previous_dir: Path = None):
+    """Decide which zip members to write for an install or an upgrade
+
+    members holds (name, crc, size, item) for every archive entry, where
+    item is whatever the caller needs to extract it later. previous is the
+    "files" map of the installed version's manifest; members whose CRC32
+    and size match it, and whose file on disk still has that size, are
+    left alone and keep their manifest entry. That file is looked for in
+    previous_dir, or in install_dir when it starts as a clone of the
+    installed version.
+
+    Returns (files, writes, dirs, removed): the manifest "files" map of
+    the new version, (item, target, relative path) for each member to
+    write, the directories to create, and the paths of the previous
+    version that are no longer shipped.
+    """
+    # Every member sits below the SDK root, so its path there drops that many parts
+    root_dir = find_sdk_root([name for name, _, _, _ in members])
+    depth = len(PurePosixPath(root_dir).parts)
+    files = {}
+    writes = []
+    dirs = set()
+    for name, crc, size, item in members:
+        if not is_safe_member(name):
+            console.print(f"[yellow]Skipping unsafe path: {name}[/yellow]")
+            continue
+        relative = '/'.join(PurePosixPath(name.replace('\\', '/')).parts[depth:])
+        if not relative:
+            continue
+        if select and not select(relative):
+            continue
+        target = install_dir / relative
+        if name.endswith('/'):
+            dirs.add(target)
+            continue
+        dirs.add(target.parent)
+        known = previous.get(relative) if previous else None
+        if known and known.get('crc') == crc and known.get('size') == size:
+            try:
+                if ((previous_dir or install_dir) / relative).stat().st_size == size:
+                    files[relative] = dict(known)
+                    continue
+            except OSError:
+                pass
+        files[relative] = {'crc': crc, 'size': size}
+        writes.append((item, target, relative))
+    removed = [relative for relative in (previous or {}) if relative not in files]
+    return files, writes, dirs, removed
+
+def copy_unchanged(files: dict, writes: list, previous_dir: Path, install_dir: Path) -> int:
+    """Copy the files an upgrade keeps from previous_dir into install_dir
+
+    For upgrades staged in an empty directory, see plan_zip_install.
+    Returns the number of bytes copied.
+    """
+    written = {relative for _, _, relative in writes}
+    copied = 0
+    for relative in files:
+        if relative not in written:
+            target = install_dir / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(previous_dir / relative, target)
+            copied += files[relative]['size']
+    return copied
+
+def _replace_file(target: Path):
+    """Open a new file at target for writing
+
+    An existing file is unlinked rather than truncated: in a staged upgrade
+    it is a hardlink shared with the live installation.
+    """
+    try:
+        target.unlink()
+    except FileNotFoundError:
+        pass
+    return open(target, 'wb')
+
+def _copy_member(source, target_file) -> str:
+    """Copy a member in bounded buffers, returning its SHA256"""
+    sha256_hash = hashlib.sha256()
+    for block in iter(lambda: source.read(COPY_BUFFER_SIZE), b''):
+        sha256_hash.update(block)
+        target_file.write(block)
+    return sha256_hash.hexdigest()
+
+def remove_stale_files(install_dir: Path, removed: list):
+    """Delete files an upgrade no longer ships, and directories left empty"""
+    parents = set()
+    for relative in removed:
+        target = install_dir / relative
+        try:
+            target.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            console.print(f"[yellow]Warning: Could not remove {relative}: {e}[/yellow]")
+            continue
+        parents.update(target.parents)
+    # Deepest first, so emptied parents can go too
+    for parent in sorted(parents, key=lambda path: len(path.parts), reverse=True):
+        if parent != install_dir and install_dir in parent.parents:
+            try:
+                parent.rmdir()
+            except OSError:
+                pass
+
+def _batch_members(writes: list) -> list:
+    """Group members into work units of similar cost for the extraction pool
+
+    Large members get a unit of their own and are handed out first; small
+    ones are packed together so per-task overhead doesn't dominate.
+    """
+    batches = []
+    batch = []
+    batch_size = 0
+    for write in sorted(writes, key=lambda write: write[0].file_size, reverse=True):
+        size = write[0].file_size
+        if size >= EXTRACT_BATCH_SIZE:
+            batches.append([write])
+            continue
+        batch.append(write)
+        batch_size += size
+        if batch_size >= EXTRACT_BATCH_SIZE or len(batch) >= EXTRACT_BATCH_FILES:
+            batches.append(batch)
+            batch = []
+            batch_size = 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+def extract_zip(zip_path: Path, install_dir: Path, select=None, previous: dict = None, on_progress=None,
+                file_store=None, previous_dir: Path = None):
+    """Extract a zip into install_dir, or upgrade the version installed there
+
+    The archive's top-level folder, if any, is stripped. With previous (see
+    plan_zip_install), only added and changed members are written and
+    members the new version dropped are deleted; with previous_dir as
+    well, install_dir starts empty and unchanged files are copied from
+    there. Directories are created
+    up front, then members are extracted by a thread pool, each thread
+    reading through its own ZipFile handle and copying in bounded buffers.
+    on_progress is called with (bytes written, bytes to write) as each
+    batch of members completes. With a file_store (see filestore.FileStore)
+    members it already holds are linked instead of extracted, and new ones
+    are added to it.
+
+    Returns (files, written, removed): the manifest "files" map, with the
+    SHA256 of every member written, and the number of members written and
+    deleted.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = [(info.filename, info.CRC, info.file_size, info) for info in zip_ref.infolist()]
+    files, writes, dirs, removed = plan_zip_install(members, install_dir, select, previous, previous_dir)
+    if previous_dir is not None:
+        copy_unchanged(files, writes, previous_dir, install_dir)
+    remove_stale_files(install_dir, removed)
+    for directory in sorted(dirs):
+        directory.mkdir(parents=True, exist_ok=True)
+        
+    # ZipFile handles are not safe to share, so each thread opens its own
+    local = threading.local()
+    handles = []
+    
+    def extract_batch(batch: list):
+        if not hasattr(local, 'zip_ref'):
+            local.zip_ref = zipfile.ZipFile(zip_path, 'r')
+            handles.append(local.zip_ref)
+        extracted_size = 0
+        failed = []
+        for info, target, relative in batch:
+            try:
+                file_hash = file_store.link_existing(info.CRC, info.file_size, target) if file_store else None
+                if not file_hash:
+                    with local.zip_ref.open(info) as source, _replace_file(target) as target_file:
+                        file_hash = _copy_member(source, target_file)
+                    if file_store:
+                        file_store.adopt(target, file_hash, info.CRC, info.file_size)
+                files[relative]['hash'] = file_hash
+                extracted_size += info.file_size
+            except Exception as e:
+                console.print(f"[yellow]Warning: Could not extract {info.filename}: {e}[/yellow]")
+                failed.append(relative)
+        return extracted_size, failed
+    
+    total_size = sum(info.file_size for info, _, _ in writes)
+    extracted_size = 0
+    batches = _batch_members(writes)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(EXTRACT_THREADS, len(batches)))) as pool:
+            for future in as_completed([pool.submit(extract_batch, batch) for batch in batches]):
+                size, failed = future.result()
+                # Not recorded, so the next upgrade writes them again
+                for relative in failed:
+                    del files[relative]
+                extracted_size += size
+                if on_progress:
+                    on_progress(extracted_size, total_size)
+    finally:
+        for handle in handles:
+            handle.close()
+    return files, len(writes), len(removed)
+
+class _ChunkPipe:
+    """Bounded hand-off of byte chunks from the event loop to an extractor thread
+
+    The loop side never blocks a thread: when the pipe is full, put()
+    awaits an event the reader sets once it takes a chunk. The reader
+    blocks in take() on its own thread.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, size: int = STREAM_QUEUE_SIZE):
+        self.loop = loop
+        self.chunks = queue.Queue(maxsize=size)
+        self.space = asyncio.Event()
+        self.waiting = False
+
+    def take(self):
+        """Get the next item, waiting for it; called from the reader thread"""
+        item = self.chunks.get()
+        if self.waiting:
+            self.waiting = False
+            try:
+                self.loop.call_soon_threadsafe(self.space.set)
+            except RuntimeError:
+                pass  # The loop is gone; nobody is waiting any more
+        return item
+
+    async def put(self, item, reader: asyncio.Future) -> bool:
+        """Hand an item to the reader, returning False once the reader has stopped"""
+        while not reader.done():
+            try:
+                self.chunks.put_nowait(item)
+                return True
+            except queue.Full:
+                pass
+            self.space.clear()
+            self.waiting = True
+            # The reader may have made room before it could see waiting
+            try:
+                self.chunks.put_nowait(item)
+                self.waiting = False
+                return True
+            except queue.Full:
+                pass
+            await self.space.wait()
+        return False
+
+    def abort(self, error: BaseException):
+        """Drop buffered chunks and make the reader raise on its next read"""
+        while True:
+            try:
+                self.chunks.get_nowait()
+            except queue.Empty:
+                break
+        self.chunks.put_nowait(error)
+
+class _QueueReader(io.RawIOBase):
+    """Read-only file object fed with byte chunks from another thread"""
+
+    def __init__(self, pipe: _ChunkPipe):
+        self.pipe = pipe
+        self.pending = b''
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending and not self.finished:
+            item = self.pipe.take()
+            if item is None:
+                self.finished = True
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                self.pending = item
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+def _start_thread(loop: asyncio.AbstractEventLoop, target, *args) -> asyncio.Future:
+    """Run target on a thread of its own, returning a future for its result
+
+    Extractors get their own threads rather than the loop's default
+    executor, so however many streams run at once, none waits for a worker.
+    """
+    future = loop.create_future()
+
+    def settle(result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run():
+        try:
+            outcome = (target(*args), None)
+        except Exception as e:
+            outcome = (None, e)
+        try:
+            loop.call_soon_threadsafe(settle, *outcome)
+        except RuntimeError:
+            pass  # The loop is closed
+
+    threading.Thread(target=run, name="devmatic-extract", daemon=True).start()
+    return future
+
+class SdkRootMoved(Exception):
+    """A streamed tar's SDK root turned out shallower than members were filtered against
+
+    root is the real one, from the full listing; extracting again with it
+    gives the right selection.
+    """
+
+    def __init__(self, root: str):
+        super().__init__(f"SDK root is '{root}'")
+        self.root = root
+
+def extract_tar_stream(fileobj, install_dir: Path, on_member=None, select=None, root: str = None) -> int:
+    """Extract a tar archive read sequentially from fileobj
+
+    The compression is detected from the stream itself. Returns the number
+    of bytes extracted; on_member is called with each member's size.
+    Members select (see member_filter) rejects below the SDK root (see
+    find_sdk_root) are not extracted, and the root is lifted into
+    install_dir with renames afterwards, matching plan_zip_install.
+
+    Unless root is given, it is only known once the stream ends, so a
+    member is skipped only when every root the names read so far still
+    allow, short of the archive's top level, rejects it. Anything kept for
+    a root deeper than the real one is removed at the end. Should the real
+    root be the top level and a skipped member be wanted after all,
+    SdkRootMoved is raised and the caller extracts again with that root.
+    """
+    extracted = []
+    skipped = []
+    names = []
+    common = None  # Folder parts shared by every file so far
+    marker_depth = None  # Shallowest folder directly holding an executable
+    # The data filter rejects links pointing outside install_dir; without it links can't be trusted
+    safe_links = hasattr(tarfile, 'data_filter')
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+        for member in tar:
+            names.append(member.name)
+            link = member.issym() or member.islnk()
+            if not is_safe_member(member.name) or (link and not safe_links):
+                console.print(f"[yellow]Skipping unsafe path: {member.name}[/yellow]")
+                continue
+            parts = PurePosixPath(member.name.replace('\\', '/')).parts
+            if root is not None:
+                depth = lowest = len(PurePosixPath(root).parts)
+            elif not member.isdir():
+                # Folder entries are only ancestors of what follows, so files alone narrow the guess
+                folders = parts[:-1]
+                if common is None:
+                    common = folders
+                while folders[:len(common)] != common:
+                    common = common[:-1]
+                if parts[-1].lower().endswith(SDK_ROOT_MARKERS):
+                    marker_depth = min(len(folders), marker_depth if marker_depth is not None else len(folders))
+                depth = len(common) if marker_depth is None else min(len(common), marker_depth)
+                lowest = min(1, depth)
+            if not member.isdir() or root is not None:
+                # Skip only what every root from the top folder down to the guess rejects
+                candidates = ['/'.join(parts[d:]) for d in range(lowest, depth + 1)]
+                if select and all(relative and not select(relative) for relative in candidates):
+                    skipped.append(member.name)
+                    continue
+            if safe_links:
+                try:
+                    tar.extract(member, install_dir, filter='data')
+                except tarfile.FilterError as e:
+                    console.print(f"[yellow]Skipping unsafe path: {member.name} ({e})[/yellow]")
+                    continue
+                except (tarfile.TarError, OSError) as e:
+                    if not link:
+                        raise
+                    # e.g. symlinks without the rights to create them on Windows
+                    console.print(f"[yellow]Skipping link {member.name}: {e}[/yellow]")
+                    continue
+            else:
+                tar.extract(member, install_dir, set_attrs=False)
+            extracted.append((member.name, member.isdir(), member.size))
+            if on_member:
+                on_member(member.size)
+
+    if root is None:
+        root = find_sdk_root(names)
+    depth = len(PurePosixPath(root).parts)
+
+    def below_root(name: str) -> str:
+        return '/'.join(PurePosixPath(name.replace('\\', '/')).parts[depth:])
+
+    if select and any(below_root(name) and select(below_root(name)) for name in skipped):
+        raise SdkRootMoved(root)
+    # Members kept for a deeper root than the real one
+    extracted_size = 0
+    rejected_files = []
+    rejected_dirs = []
+    for name, is_dir, size in extracted:
+        relative = below_root(name)
+        if not relative or not select or select(relative):
+            extracted_size += size
+        elif is_dir:
+            rejected_dirs.append(relative)
+        else:
+            rejected_files.append(relative)
+    root_dir = install_dir / root
+    remove_stale_files(root_dir, rejected_files)
+    # Deepest first; folders still holding selected files stay
+    for relative in sorted(rejected_dirs, key=lambda path: path.count('/'), reverse=True):
+        try:
+            (root_dir / relative).rmdir()
+        except OSError:
+            pass
+    _hoist_root(install_dir, root)
+    return extracted_size
+
+def extract_tar(tar_path: Path, install_dir: Path, select=None, on_progress=None) -> int:
+    """Extract a tar archive file, see extract_tar_stream
+
+    on_progress is called with the compressed bytes read so far. Returns
+    the number of bytes extracted.
+    """
+    with open(tar_path, 'rb') as archive:
+        on_member = (lambda _: on_progress(archive.tell())) if on_progress else None
+        try:
+            return extract_tar_stream(archive, install_dir, on_member, select)
+        except SdkRootMoved as e:
+            archive.seek(0)
+            clear_dir(install_dir)
+            return extract_tar_stream(archive, install_dir, on_member, select, e.root)
+
+def clear_dir(directory: Path):
+    """Empty a directory before extracting into it again"""
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True, exist_ok=True)
+
+async def stream_extract_tar_async(url: str, install_dir: Path, description: str, file_hash: str = None,
+                                   session: aiohttp.ClientSession = None, progress: Progress = None,
+                                   priority: int = 0, select=None, use_cache: bool = False):
+    """Download a tar archive and extract it while the bytes arrive
+
+    The HTTP body feeds the decompressor, which feeds tarfile in stream
+    mode on a thread of its own, so download and extraction overlap and no
+    copy of the archive is written to disk. A dropped connection is
+    retried with a Range request from the byte the decompressor last
+    received. The SHA256 is computed inline and checked once the stream
+    ends. use_cache opts into also writing the bytes to the download
+    cache, for callers that want the archive kept after all. Should the SDK root only show up at the end of a
+    filtered archive, it is streamed once more (see SdkRootMoved).
+    Returns (success, downloaded bytes).
+    """
+    loop = asyncio.get_running_loop()
+    own_session = session is None
+    task = None
+    cache_file = CACHE_DIR / f"{uuid.uuid4().hex}.tmp" if use_cache else None
+    cache_handle = None
+
+    def on_data(data: bytes, downloaded: int):
+        if cache_handle is not None:
+            cache_handle.write(data)
+        if task is not None:
+            progress.update(task, completed=downloaded)
+
+    try:
+        if own_session:
+            session = aiohttp.ClientSession(raise_for_status=True)
+        install_dir.mkdir(parents=True, exist_ok=True)
+        if cache_file is not None:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            cache_handle = open(cache_file, 'wb')
+        if progress:
+            task = progress.add_task(
+                f"[cyan]Installing {description[:15]}{'...' if len(description) > 15 else ''}",
+                total=None
+            )
+
+        root = None
+        while True:
+            try:
+                downloaded, digest = await _stream_tar(url, install_dir, description, session, priority,
+                                                       select, root, on_data, progress, task)
+                break
+            except SdkRootMoved as e:
+                if root is not None:
+                    raise
+                root = e.root
+                console.print(f"[dim]{description}: the SDK root is '{root}', extracting again[/dim]")
+                await loop.run_in_executor(None, clear_dir, install_dir)
+                if cache_handle is not None:
+                    cache_handle.seek(0)
+                    cache_handle.truncate()
+
+        if file_hash and digest != file_hash.lower():
+            raise ValueError("File hash verification failed")
+        if cache_handle is not None:
+            cache_handle.close()
+            store_cached_file(cache_file, digest, url)
+        return True, downloaded
+
+    except Exception as e:
+        console.print(f"[bold red]✗ Error installing {description}: {e}[/bold red]")
+        return False, 0
+
+    finally:
+        if cache_handle is not None:
+            cache_handle.close()
+            cache_file.unlink(missing_ok=True)
+        if task is not None:
+            progress.remove_task(task)
+        if own_session and session is not None:
+            await session.close()
+
+async def _stream_tar(url: str, install_dir: Path, description: str, session: aiohttp.ClientSession,
+                      priority: int, select, root: str, on_data, progress: Progress = None, task=None):
+    """Stream a tar archive through extract_tar_stream once, returning (downloaded, SHA256)"""
+    loop = asyncio.get_running_loop()
+    pipe = _ChunkPipe(loop)
+    sha256_hash = hashlib.sha256()
+    downloaded = 0
+    budget = get_download_budget()
+    extractor = _start_thread(loop, extract_tar_stream, _QueueReader(pipe), install_dir, None, select, root)
+    # Wake a feeder waiting for room once nobody will make any
+    extractor.add_done_callback(lambda _: pipe.space.set())
+    try:
+        etag = None
+        attempt = 0
+        stopped = False
+        while not stopped:
+            headers = {'Accept-Encoding': 'identity'}
+            if downloaded:
+                headers['Range'] = f'bytes={downloaded}-'
+                if etag:
+                    headers['If-Range'] = etag
+            try:
+                async with budget.connection(priority):
+                    async with session.get(url, headers=headers) as response:
+                        if downloaded and response.status != 206:
+                            raise RangeNotSupported(f"Cannot resume {description} (HTTP {response.status})")
+                        etag = etag or response.headers.get('etag')
+                        if task is not None and not downloaded:
+                            progress.update(task, total=int(response.headers.get('content-length', 0)) or None)
+                        async for data in response.content.iter_chunked(65536):
+                            await budget.throttle(len(data), priority)
+                            if not await pipe.put(data, extractor):
+                                stopped = True  # The extractor stopped early; its error surfaces below
+                                break
+                            sha256_hash.update(data)
+                            downloaded += len(data)
+                            on_data(data, downloaded)
+                break
+            except Exception as e:
+                retryable = _is_retryable(e) or isinstance(e, asyncio.IncompleteReadError)
+                if not retryable or attempt == RANGE_RETRIES:
+                    raise
+                console.print(f"[yellow]{description}: connection lost at {format_size(downloaded)}, resuming[/yellow]")
+                await asyncio.sleep(_retry_delay(attempt))
+                attempt += 1
+
+        await pipe.put(None, extractor)
+        await extractor
+        return downloaded, sha256_hash.hexdigest()
+
+    except BaseException as e:
+        if not extractor.done():
+            # Unblock the extractor thread so it can exit
+            pipe.abort(e if isinstance(e, Exception) else RuntimeError("Installation cancelled"))
+            if isinstance(e, Exception):
+                try:
+                    await extractor
+                except Exception:
+                    pass
+            else:
+                # Cancelled; the thread still settles the future once it has stopped
+                extractor.add_done_callback(lambda future: future.exception())
+        raise
+
+class ZipEntry(NamedTuple):
+    """A member as listed in a zip's central directory"""
+    name: str
+    method: int
+    flags: int
+    crc: int
+    compress_size: int
+    file_size: int
+    header_offset: int
+    end: int  # Where the next member (or the central directory) begins
+
+async def parse_zip_index(tail: bytes, tail_offset: int, read_range) -> list:
+    """Parse a zip's central directory into ZipEntry records
+
+    tail holds the last bytes of the archive, starting at tail_offset, and
+    read_range(start, end) is awaited for any other bytes needed (the
+    zip64 record and a central directory not covered by the tail).
+    """
+    async def read_at(start: int, size: int) -> bytes:
+        if start >= tail_offset:
+            return tail[start - tail_offset:start - tail_offset + size]
+        return await read_range(start, start + size - 1)
+        
+    eocd = tail.rfind(b'PK\x05\x06')
+    if eocd < 0:
+        raise ValueError("Not a zip archive: end of central directory not found")
+    total, cd_size, cd_offset = struct.unpack('<10xHII', tail[eocd:eocd + 20])
+    
+    # Zip64 archives keep the real counts in a separate record
+    if cd_offset == 0xFFFFFFFF or cd_size == 0xFFFFFFFF or total == 0xFFFF:
+        locator = tail[eocd - 20:eocd]
+        if locator[:4] != b'PK\x06\x07':
+            raise ValueError("Zip64 locator not found")
+        eocd64_offset = struct.unpack('<8xQ', locator[:16])[0]
+        total, cd_size, cd_offset = struct.unpack('<32xQQQ', await read_at(eocd64_offset, 56))
+    
+    directory = await read_at(cd_offset, cd_size)
+    entries = []
+    position = 0
+    for _ in range(total):
+        (signature, flags, method, crc, compress_size, file_size,
+         name_length, extra_length, comment_length, header_offset) = struct.unpack(
+            '<I4xHH4xIIIHHH8xI', directory[position:position + 46])
+        if signature != 0x02014b50:
+            raise ValueError("Corrupt zip central directory")
+        name = directory[position + 46:position + 46 + name_length]
+        name = name.decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = directory[position + 46 + name_length:position + 46 + name_length + extra_length]
+        if 0xFFFFFFFF in (compress_size, file_size, header_offset):
+            file_size, compress_size, header_offset = _zip64_sizes(extra, file_size, compress_size, header_offset)
+        entries.append((name, method, flags, crc, compress_size, file_size, header_offset))
+        position += 46 + name_length + extra_length + comment_length
+    
+    # Each member's data runs until the next local header in file order
+    entries.sort(key=lambda entry: entry[6])
+    ends = [entry[6] for entry in entries[1:]] + [cd_offset]
+    return [ZipEntry(*entry, end) for entry, end in zip(entries, ends)]
+
+def _zip64_sizes(extra: bytes, file_size: int, compress_size: int, header_offset: int):
+    """Read the 64-bit values a zip64 extra field replaces"""
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, size = struct.unpack('<HH', extra[position:position + 4])
+        if header_id == 0x0001:
+            values = iter(struct.unpack(f'<{size // 8}Q', extra[position + 4:position + 4 + size - size % 8]))
+            # Only the fields saturated in the fixed record are present, in this order
+            if file_size == 0xFFFFFFFF:
+                file_size = next(values)
+            if compress_size == 0xFFFFFFFF:
+                compress_size = next(values)
+            if header_offset == 0xFFFFFFFF:
+                header_offset = next(values)
+            break
+        position += 4 + size
+    return file_size, compress_size, header_offset
+
+async def _read_range(session: aiohttp.ClientSession, url: str, start: int, end: int, priority: int = 0) -> bytes:
+    """Read bytes start..end (inclusive) of a remote file within the download budget"""
+    budget = get_download_budget()
+    headers = {'Range': f'bytes={start}-{end}', 'Accept-Encoding': 'identity'}
+    async with budget.connection(priority), session.get(url, headers=headers) as response:
+        if response.status != 206:
+            raise ValueError(f"Server ignored range request (HTTP {response.status})")
+        data = await response.read()
+        await budget.throttle(len(data), priority)
+        return data
+
+async def read_remote_zip_index(session: aiohttp.ClientSession, url: str, total_size: int,
+                                priority: int = 0) -> list:
+    """Fetch and parse the central directory of a remote zip with range requests"""
+    tail_offset = max(0, total_size - ZIP_TAIL_SIZE)
+    tail = await _read_range(session, url, tail_offset, total_size - 1, priority)
+    return await parse_zip_index(tail, tail_offset,
+                                 lambda start, end: _read_range(session, url, start, end, priority))
+
+def _plan_spans(entries: list) -> list:
+    """Group members into ranges, merging neighbours separated by small gaps"""
+    spans = []
+    for entry in sorted(entries, key=lambda entry: entry.header_offset):
+        if spans:
+            last = spans[-1]
+            if (entry.header_offset - last[-1].end <= ZIP_COALESCE_GAP
+                    and entry.end - last[0].header_offset <= ZIP_MAX_SPAN):
+                last.append(entry)
+                continue
+        spans.append([entry])
+    return spans
+
+async def fetch_zip_members_async(url: str, install_dir: Path, description: str, select=None,
+                                  session: aiohttp.ClientSession = None, progress: Progress = None,
+                                  priority: int = 0, previous: dict = None, file_store=None,
+                                  previous_dir: Path = None):
+    """Install selected members of a remote zip without downloading the rest
+
+    The central directory is read with range requests, members are chosen
+    with select (see member_filter) below the archive's top-level folder,
+    and only their bytes are requested, neighbouring members sharing one
+    range. Members are inflated as they arrive and checked against their
+    CRC32. With previous, unchanged members are not fetched at all, see
+    plan_zip_install, and neither are members file_store already holds.
+    previous_dir is as for extract_zip.
+    Raises when the server or archive does not allow this, so the caller
+    can fall back to a full download.
+
+    Returns (downloaded, files, written, removed): the bytes downloaded,
+    then the same as extract_zip.
+    """
+    budget = get_download_budget()
+    own_session = session is None
+    task = None
+    try:
+        if own_session:
+            session = aiohttp.ClientSession(raise_for_status=True)
+        info = await probe_remote_file(session, url, priority)
+        if not info['ranges'] or not info['total_size']:
+            raise ValueError("Server does not support range requests")
+        entries = await read_remote_zip_index(session, url, info['total_size'], priority)
+        
+        files, writes, dirs, removed = plan_zip_install(
+            [(entry.name, entry.crc, entry.file_size, entry) for entry in entries], install_dir, select, previous,
+            previous_dir)
+        for entry, _, _ in writes:
+            if entry.flags & 0x1 or entry.method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                raise ValueError(f"Unsupported zip member {entry.name}")
+        if previous_dir is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, copy_unchanged, files, writes, previous_dir, install_dir)
+        remove_stale_files(install_dir, removed)
+        for directory in dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+        targets = {}
+        
+        def link_stored():
+            # Blobs may need their CRC32 checked, which is file I/O
+            for entry, target, relative in writes:
+                file_hash = file_store.link_existing(entry.crc, entry.file_size, target)
+                if file_hash:
+                    files[relative]['hash'] = file_hash
+                else:
+                    targets[entry] = (target, relative)
+        
+        if file_store:
+            await asyncio.get_running_loop().run_in_executor(None, link_stored)
+        else:
+            targets = {entry: (target, relative) for entry, target, relative in writes}
+        
+        total = sum(entry.end - entry.header_offset for entry in targets)
+        skipped = info['total_size'] - total
+        console.print(f"[dim]Fetching {len(targets)} of {len(entries)} members of {description}, skipping {skipped * 100 // info['total_size']}% of the archive[/dim]")
+        if progress:
+            task = progress.add_task(
+                f"[cyan]Fetching {description[:15]}{'...' if len(description) > 15 else ''}",
+                total=total
+            )
+        
+        downloaded = 0
+        done = set()
+        
+        async def fetch_span(span: list):
+            nonlocal downloaded
+            pending = [entry for entry in span if entry not in done]
+            start, end = pending[0].header_offset, pending[-1].end - 1
+            headers = {'Range': f'bytes={start}-{end}', 'Accept-Encoding': 'identity'}
+            async with session.get(url, headers=headers) as response:
+                if response.status != 206:
+                    raise ValueError(f"Server ignored range request (HTTP {response.status})")
+                position = start
+                for entry in pending:
+                    # Skip members left out of the selection and data descriptors
+                    await response.content.readexactly(entry.header_offset - position)
+                    header = await response.content.readexactly(30)
+                    if header[:4] != b'PK\x03\x04':
+                        raise ValueError(f"Corrupt local header for {entry.name}")
+                    name_length, extra_length = struct.unpack('<HH', header[26:30])
+                    await response.content.readexactly(name_length + extra_length)
+                    
+                    decompressor = zlib.decompressobj(-15) if entry.method == zipfile.ZIP_DEFLATED else None
+                    sha256_hash = hashlib.sha256()
+                    crc = 0
+                    remaining = entry.compress_size
+                    target, relative = targets[entry]
+                    with _replace_file(target) as f:
+                        while remaining:
+                            data = await response.content.readexactly(min(remaining, 65536))
+                            remaining -= len(data)
+                            await budget.throttle(len(data), priority)
+                            if decompressor:
+                                data = decompressor.decompress(data)
+                            crc = zlib.crc32(data, crc)
+                            f.write(data)
+                            sha256_hash.update(data)
+                        if decompressor:
+                            data = decompressor.flush()
+                            crc = zlib.crc32(data, crc)
+                            f.write(data)
+                            sha256_hash.update(data)
+                    if crc != entry.crc:
+                        raise ValueError(f"CRC mismatch for {entry.name}")
+                    files[relative]['hash'] = sha256_hash.hexdigest()
+                    if file_store:
+                        file_store.adopt(target, files[relative]['hash'], entry.crc, entry.file_size)
+                    
+                    position = entry.header_offset + 30 + name_length + extra_length + entry.compress_size
+                    done.add(entry)
+                    downloaded += entry.end - entry.header_offset
+                    if task is not None:
+                        progress.update(task, completed=downloaded)
+        
+        async def worker(spans: list):
+            while spans:
+                span = spans.pop()
+                for attempt in range(RANGE_RETRIES + 1):
+                    async with budget.connection(priority):
+                        try:
+                            await fetch_span(span)
+                            break
+                        except Exception as e:
+                            retryable = _is_retryable(e) or isinstance(e, asyncio.IncompleteReadError)
+                            if not retryable or attempt == RANGE_RETRIES:
+                                raise
+                    # Members completed before the failure are not requested again
+                    await asyncio.sleep(_retry_delay(attempt))
+        
+        spans = _plan_spans(list(targets))
+        # Largest spans first, so one big member doesn't finish last
+        spans.sort(key=lambda span: span[-1].end - span[0].header_offset)
+        await asyncio.gather(*(worker(spans) for _ in range(min(ZIP_CONNECTIONS, len(spans)))))
+        return downloaded, files, len(writes), len(removed)
+        
+    finally:
+        if task is not None:
+            progress.remove_task(task)
+        if own_session and session is not None:
+            await session.close()
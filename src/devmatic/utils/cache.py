@@ -0,0 +1,169 @@
+"""
+Download cache for DevMatic
+
+Keeps downloaded archives in a content-addressed store keyed by SHA256 so
+reinstalls and repairs never fetch the same archive twice.
+"""
+
+import os
+import sys
+import json
+import shutil
+import contextlib
+from pathlib import Path
+from rich.console import Console
+
+from .paths import CACHE_DIR
+from .format import format_size
+
+console = Console()
+
+CACHE_INDEX_FILE = CACHE_DIR / 'index.json'
+CACHE_LOCK_FILE = CACHE_DIR / 'index.lock'
+# Size cap in MB, overridable through the environment
+CACHE_MAX_SIZE = int(os.environ.get('DEVMATIC_CACHE_MAX_SIZE', 10 * 1024)) * 1024 * 1024
+
+def _load_index():
+    """Load the URL to hash index of the cache"""
+    if not CACHE_INDEX_FILE.exists():
+        return {}
+    try:
+        with open(CACHE_INDEX_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_index(index: dict):
+    """Atomically write the URL to hash index of the cache"""
+    tmp_file = CACHE_INDEX_FILE.with_name(f"{CACHE_INDEX_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, CACHE_INDEX_FILE)
+
+@contextlib.contextmanager
+def _index_lock():
+    """Hold the cache index lock, which other DevMatic processes share"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(CACHE_LOCK_FILE, 'a+b') as f:
+        if sys.platform == 'win32':
+            import msvcrt
+            f.seek(0)
+            # LK_LOCK gives up after ten seconds, so keep asking
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _update_index(change):
+    """Apply change to the index as currently on disk and save it if it changed
+
+    Runs under the index lock, so entries other processes add meanwhile
+    are kept.
+    """
+    with _index_lock():
+        index = _load_index()
+        updated = change(dict(index))
+        if updated != index:
+            _save_index(updated)
+
+def _link_or_copy(source: Path, target: Path):
+    """Hardlink source to target, copying when links are not supported"""
+    tmp_target = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    if tmp_target.exists():
+        tmp_target.unlink()
+    try:
+        os.link(source, tmp_target)
+    except OSError:
+        shutil.copyfile(source, tmp_target)
+    os.replace(tmp_target, target)
+
+def cached_file_path(file_hash: str) -> Path:
+    """Get the cache location of a file with the given SHA256"""
+    return CACHE_DIR / file_hash.lower()
+
+def lookup_cached_file(url: str, file_hash: str = None):
+    """Find a cached copy of a download by its hash, or by the hash last seen for its URL"""
+    if not file_hash:
+        file_hash = _load_index().get(url)
+        if not file_hash:
+            return None
+        
+    cached_file = cached_file_path(file_hash)
+    if not cached_file.exists():
+        return None
+    
+    # Mark as recently used for LRU eviction
+    os.utime(cached_file)
+    return cached_file
+
+def restore_cached_file(cached_file: Path, destination: Path):
+    """Place a cached file at the destination without copying data where possible"""
+    _link_or_copy(cached_file, destination)
+
+def store_cached_file(file_path: Path, file_hash: str, url: str = None, max_size: int = None):
+    """Add a downloaded file to the cache and evict old entries beyond the size cap"""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cached_file = cached_file_path(file_hash)
+        if not cached_file.exists():
+            _link_or_copy(file_path, cached_file)
+        os.utime(cached_file)
+        
+        # Remember the hash so entries without a catalog hash can be found again
+        if url and _load_index().get(url) != file_hash.lower():
+            _update_index(lambda index: {**index, url: file_hash.lower()})
+                
+        evict_cache(CACHE_MAX_SIZE if max_size is None else max_size, keep=cached_file)
+        
+    except Exception as e:
+        console.print(f"[yellow]Warning: Could not cache {file_path.name}: {e}[/yellow]")
+
+def discard_cached_file(file_hash: str):
+    """Remove a single entry from the cache"""
+    cached_file = cached_file_path(file_hash)
+    if cached_file.exists():
+        cached_file.unlink()
+
+def evict_cache(max_size: int = CACHE_MAX_SIZE, keep: Path = None):
+    """Remove least recently used files until the cache fits in max_size bytes"""
+    if not CACHE_DIR.exists():
+        return 0
+        
+    entries = []
+    for item in CACHE_DIR.iterdir():
+        if item in (CACHE_INDEX_FILE, CACHE_LOCK_FILE) or item.suffix == '.tmp' or not item.is_file():
+            continue
+        stat = item.stat()
+        entries.append((stat.st_mtime, stat.st_size, item))
+        
+    total_size = sum(size for _, size, _ in entries)
+    freed = 0
+    for _, size, item in sorted(entries, key=lambda entry: entry[0]):
+        if total_size <= max_size:
+            break
+        if item == keep:
+            continue
+        item.unlink()
+        total_size -= size
+        freed += size
+        
+    if freed:
+        # Drop index entries pointing at evicted files
+        _update_index(lambda index: {url: value for url, value in index.items()
+                                     if cached_file_path(value).exists()})
+        console.print(f"[dim]Evicted {format_size(float(freed))} from download cache[/dim]")
+    return freed
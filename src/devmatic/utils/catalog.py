@@ -0,0 +1,193 @@
+"""
+Catalogs for DevMatic
+
+Keeps the apps and SDK catalogs under .devmatic and revalidates them with
+conditional requests, so a warm start reads them from disk and a stale
+one costs a 304 instead of the whole document. The SDK catalog is loaded
+once per run into records indexed by name, alias and version.
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from rich.console import Console
+
+from .paths import CATALOG_DIR
+from .http_client import get_http_client
+from .store import current_version
+
+console = Console()
+
+CATALOG_BASE_URL = "https://raw.githubusercontent.com/minimalistmg/DevMatic/main/src/devmatic/apps"
+APPS_CATALOG = 'apps.json'
+SDK_CATALOG = 'toolkit.json'
+# Seconds a cached catalog is used without asking the server, overridable through the environment
+CATALOG_TTL = int(os.environ.get('DEVMATIC_CATALOG_TTL', 3600))
+
+_offline = os.environ.get('DEVMATIC_OFFLINE', '') not in ('', '0')
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+_UNSET = object()
+
+class SdkRecord:
+    """One catalog entry; fields the installer doesn't use stay in extra"""
+
+    __slots__ = ('name', 'version', 'url', 'description', 'hash', 'mirrors',
+                 'include', 'exclude', 'aliases', 'extra', '_installed')
+    FIELDS = ('name', 'version', 'url', 'description', 'hash', 'mirrors', 'include', 'exclude', 'aliases')
+
+    def __init__(self, entry: dict):
+        for field in self.FIELDS:
+            setattr(self, field, entry.get(field))
+        self.description = self.description or ''
+        self.aliases = self.aliases or []
+        self.extra = {key: value for key, value in entry.items() if key not in self.FIELDS}
+        self._installed = _UNSET
+
+    @property
+    def installed_version(self):
+        """The active installed version, looked up on first access"""
+        if self._installed is _UNSET:
+            self._installed = current_version(self.name)
+        return self._installed
+
+    def __repr__(self):
+        return f"SdkRecord({self.name!r}, {self.version!r})"
+
+class SdkCatalog:
+    """SDK catalog with O(1) lookups by name, alias and version
+
+    Names and aliases match case-insensitively. A name listed more than
+    once offers several versions; its first entry is the default.
+    """
+
+    __slots__ = ('_records', '_by_name', '_by_version')
+
+    def __init__(self, entries: list):
+        self._records = []
+        self._by_name = {}
+        self._by_version = {}
+        for entry in entries:
+            record = SdkRecord(entry)
+            versions = self._by_version.setdefault(record.name.lower(), {})
+            if record.version in versions:
+                continue
+            versions[record.version] = record
+            default = self._by_name.setdefault(record.name.lower(), record)
+            if default is record:
+                self._records.append(record)
+            for alias in record.aliases:
+                self._by_name.setdefault(alias.lower(), default)
+
+    def get(self, name: str, version: str = None):
+        """Find an SDK by name or alias, optionally a specific version; None if unknown"""
+        record = self._by_name.get(name.lower())
+        if record is None or version is None:
+            return record
+        return self._by_version[record.name.lower()].get(version)
+
+    def versions(self, name: str) -> list:
+        """List the versions the catalog offers for an SDK"""
+        record = self._by_name.get(name.lower())
+        return list(self._by_version[record.name.lower()]) if record else []
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._by_name
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+def configure_catalog(offline: bool = None):
+    """Switch offline mode, where catalogs only come from the cache
+
+    None keeps the current setting, which defaults to the DEVMATIC_OFFLINE
+    environment variable.
+    """
+    global _offline
+    if offline is not None:
+        _offline = offline
+
+def is_offline() -> bool:
+    """Check whether DevMatic runs without network access"""
+    return _offline
+
+def _load_cached(name: str):
+    """Load a cached catalog and its validators, (None, {}) if there is none"""
+    try:
+        with open(CATALOG_DIR / f"{name}.meta", 'r') as f:
+            meta = json.load(f)
+        with open(CATALOG_DIR / name, 'r') as f:
+            return json.load(f), meta
+    except (OSError, ValueError):
+        return None, {}
+
+def _save_cached(name: str, body: bytes, meta: dict):
+    """Atomically store a catalog and then its validators; body None keeps the stored copy"""
+    CATALOG_DIR.mkdir(parents=True, exist_ok=True)
+    for file_name, content in ((name, body), (f"{name}.meta", json.dumps(meta).encode())):
+        if content is None:
+            continue
+        tmp_file = CATALOG_DIR / f"{file_name}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_file, CATALOG_DIR / file_name)
+
+async def fetch_catalog_async(name: str):
+    """Get a catalog from the cache, revalidating it once its TTL expired
+
+    Falls back to a stale copy when the server can't be reached. Raises
+    when there is no usable copy at all.
+    """
+    data, meta = _load_cached(name)
+    if data is not None and (_offline or time.time() - meta.get('fetched', 0) < CATALOG_TTL):
+        return data
+    if _offline:
+        raise RuntimeError(f"{name} is not cached; run once without --offline")
+        
+    headers = {}
+    if data is not None:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        session = await get_http_client().get_session()
+        async with session.get(f"{CATALOG_BASE_URL}/{name}", headers=headers) as response:
+            if response.status == 304 and data is not None:
+                meta['fetched'] = time.time()
+                _save_cached(name, None, meta)
+                return data
+            body = await response.read()
+            fresh = json.loads(body)
+            _save_cached(name, body, {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched': time.time()
+            })
+            return fresh
+    except Exception as e:
+        if data is None:
+            raise
+        console.print(f"[yellow]Warning: Could not refresh {name} ({e}), using cached copy[/yellow]")
+        return data
+
+async def _fetch_catalogs_async():
+    return await asyncio.gather(fetch_catalog_async(APPS_CATALOG), fetch_catalog_async(SDK_CATALOG))
+
+def load_catalogs():
+    """Get the apps list and the SdkCatalog, fetching both at once on first use
+
+    Later calls in the same run reuse the result.
+    """
+    with _catalogs_lock:
+        if not _catalogs:
+            apps, sdks = get_http_client().run(_fetch_catalogs_async())
+            _catalogs[APPS_CATALOG] = apps
+            _catalogs[SDK_CATALOG] = SdkCatalog(sdks)
+        return _catalogs[APPS_CATALOG], _catalogs[SDK_CATALOG]
@@ -4,35 +4,709 @@ Download utilities for DevMatic
 Provides functions for downloading and verifying files.
 """
 
+import os
+import json
+import mmap
 import hashlib
 import time
-import shutil
+import heapq
+import random
+import itertools
 import asyncio
+import contextlib
 import aiohttp
 from pathlib import Path
+from urllib.parse import urlparse
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, DownloadColumn, TransferSpeedColumn
 
-from .format import format_size, format_time
+from .format import format_size, format_time, parse_size
+from .http_client import get_http_client, USER_AGENT
+from .cache import lookup_cached_file, restore_cached_file, store_cached_file, discard_cached_file
 
 console = Console()
 
+# Constants for optimized download
+CHUNK_SIZE = 1024 * 1024  # 1MB chunks
+MAX_CHUNKS = 8  # Maximum concurrent connections
+SEGMENT_SIZE = 4 * CHUNK_SIZE  # Work unit handed to a connection
+MIN_STEAL_SIZE = 2 * CHUNK_SIZE  # Smallest remainder worth splitting
+ADAPT_INTERVAL = 1.0  # Seconds between connection count adjustments
+RETRY_BUDGET = 12  # Failed range requests tolerated per download
+RANGE_RETRIES = 5  # Failed requests tolerated for a single range
+RETRY_BASE_DELAY = 0.5  # Seconds before the first retry, doubled each time
+RETRY_MAX_DELAY = 20.0  # Upper bound for the retry delay
+MIRROR_SAMPLE_SIZE = 64 * 1024  # Bytes compared across mirrors before striping
+MANIFEST_SAVE_INTERVAL = 1.0  # Seconds between manifest checkpoints
+HASH_BLOCK_SIZE = 1024 * 1024  # Read size when hashing from disk
+
+class DownloadError(Exception):
+    """A download that ran out of retries, with a report of every failed request"""
+
+    def __init__(self, message: str, failures: list):
+        super().__init__(message)
+        self.failures = failures
+
+    def report(self) -> str:
+        """Describe each failed range request, one per line"""
+        return "\n".join(
+            f"{failure['source']} bytes {failure['start']}-{failure['end']} at offset {failure['offset']} "
+            f"(attempt {failure['attempt']}): {failure['error']}"
+            for failure in self.failures
+        )
+
+class RangeNotSupported(ValueError):
+    """A server answered a range request with something other than 206"""
+
+def _is_retryable(error: Exception) -> bool:
+    """Check whether a failed request is worth repeating"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        # Server errors and throttling are transient, other statuses are not
+        return error.status >= 500 or error.status == 429
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+def _partial_paths(destination: Path):
+    """Get the partial download file and its chunk manifest"""
+    return (
+        destination.with_name(f"{destination.name}.part"),
+        destination.with_name(f"{destination.name}.part.json")
+    )
+
+def _load_manifest(manifest_file: Path):
+    """Load the chunk manifest of a partial download, if any"""
+    if not manifest_file.exists():
+        return None
+    try:
+        with open(manifest_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_manifest(manifest_file: Path, manifest: dict):
+    """Atomically persist the chunk manifest of a partial download"""
+    tmp_file = manifest_file.with_name(f"{manifest_file.name}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_file, manifest_file)
+
+def _preallocate(file_path: Path, size: int):
+    """Create a file of the given size, reserving disk blocks where supported"""
+    with open(file_path, 'wb') as f:
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        # Fall back to a sparse file
+        f.truncate(size)
+
+def _can_resume(manifest, url: str, total_size: int, etag: str, last_modified: str) -> bool:
+    """Check that a saved manifest still describes the remote file"""
+    if not manifest:
+        return False
+    # Without a validator we cannot tell whether the remote file changed
+    if not etag and not last_modified:
+        return False
+    return (
+        manifest.get('url') == url
+        and manifest.get('total_size') == total_size
+        and manifest.get('etag') == etag
+        and manifest.get('last_modified') == last_modified
+    )
+
+class _PrefixHasher:
+    """SHA256 of a file computed while its ranges are still downloading
+
+    Bytes are hashed in file order behind a watermark: data arriving exactly
+    at the watermark is hashed straight from memory, and ranges that finished
+    ahead of it are read back (from the OS cache) once the watermark reaches
+    them. When the download completes, so does the hash.
+    """
+
+    def __init__(self, file_path: Path, chunks: list):
+        self.file_path = file_path
+        self.chunks = chunks
+        self.position = 0
+        self.sha256 = hashlib.sha256()
+
+    def update(self, offset: int, data: bytes):
+        """Record data just written at offset"""
+        if offset == self.position:
+            self.sha256.update(data)
+            self.position += len(data)
+        self.catch_up()
+
+    def catch_up(self):
+        """Hash any bytes already on disk directly after the watermark"""
+        reach = self._contiguous_end()
+        if reach <= self.position:
+            return
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.position)
+            while self.position < reach:
+                block = f.read(min(HASH_BLOCK_SIZE, reach - self.position))
+                if not block:
+                    break
+                self.sha256.update(block)
+                self.position += len(block)
+                # Later ranges may already be complete as well
+                if self.position == reach:
+                    reach = self._contiguous_end()
+
+    def _contiguous_end(self) -> int:
+        """Offset up to which the file has been received without gaps"""
+        for chunk in self.chunks:
+            if chunk['start'] <= self.position <= chunk['end']:
+                return chunk['start'] + chunk['received']
+        return self.position
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+# Connection counts that worked best per host, reused by later downloads
+_host_connections = {}
+# Whether each host honors Range requests, learned by probe_remote_file
+_host_ranges = {}
+
+class DownloadBudget:
+    """Global connection and bandwidth limits shared by concurrent downloads
+
+    Connections are handed out like a semaphore and bandwidth through a
+    token bucket holding one second worth of bytes. Waiters are served in
+    priority order (lower numbers first), so the SDK the user is waiting on
+    finishes first. Without limits both checks return immediately, and an
+    idle budget never holds back the downloads that are still running.
+    """
+
+    def __init__(self, max_connections: int = None, max_bandwidth: int = None):
+        self.max_connections = max_connections
+        self.max_bandwidth = max_bandwidth
+        self._in_use = 0
+        self._connection_waiters = []
+        self._bandwidth_waiters = []
+        self._tokens = float(max_bandwidth or 0)
+        self._refilled = time.monotonic()
+        self._timer = None
+        self._order = itertools.count()
+
+    @contextlib.asynccontextmanager
+    async def connection(self, priority: int = 0):
+        """Hold one of the global connection slots"""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int):
+        if not self.max_connections:
+            return
+        if self._in_use < self.max_connections and not self._connection_waiters:
+            self._in_use += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._connection_waiters, (priority, next(self._order), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just as we were cancelled
+                self._release()
+            raise
+
+    def _release(self):
+        if not self.max_connections:
+            return
+        self._in_use -= 1
+        while self._connection_waiters and self._in_use < self.max_connections:
+            _, _, waiter = heapq.heappop(self._connection_waiters)
+            if not waiter.done():
+                self._in_use += 1
+                waiter.set_result(None)
+
+    async def throttle(self, size: int, priority: int = 0):
+        """Wait until size bytes fit in the bandwidth budget"""
+        if not self.max_bandwidth:
+            return
+        self._refill()
+        if self._tokens > 0 and not self._bandwidth_waiters:
+            self._tokens -= size
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._bandwidth_waiters, (priority, next(self._order), size, waiter))
+        self._pump()
+        await waiter
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.max_bandwidth),
+                           self._tokens + (now - self._refilled) * self.max_bandwidth)
+        self._refilled = now
+
+    def _on_timer(self):
+        self._timer = None
+        self._pump()
+
+    def _pump(self):
+        """Grant queued bandwidth requests as tokens become available"""
+        self._refill()
+        # Tokens may go negative so requests larger than the bucket still pass
+        while self._bandwidth_waiters and self._tokens > 0:
+            _, _, size, waiter = heapq.heappop(self._bandwidth_waiters)
+            if not waiter.done():
+                self._tokens -= size
+                waiter.set_result(None)
+        if self._bandwidth_waiters and self._timer is None:
+            delay = max(-self._tokens, 1.0) / self.max_bandwidth
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+def _limit_from_env(name: str, parse=int):
+    value = os.environ.get(name)
+    return parse(value) if value else None
+
+_budget = DownloadBudget(
+    max_connections=_limit_from_env('DEVMATIC_MAX_CONNECTIONS'),
+    max_bandwidth=_limit_from_env('DEVMATIC_MAX_BANDWIDTH', parse_size)
+)
+
+def configure_download_limits(max_connections: int = None, max_bandwidth: int = None):
+    """Set the global connection cap and bandwidth limit (bytes per second)
+
+    Limits left as None keep their current value, which defaults to the
+    DEVMATIC_MAX_CONNECTIONS and DEVMATIC_MAX_BANDWIDTH environment variables.
+    """
+    global _budget
+    _budget = DownloadBudget(
+        max_connections=max_connections if max_connections is not None else _budget.max_connections,
+        max_bandwidth=max_bandwidth if max_bandwidth is not None else _budget.max_bandwidth
+    )
+
+def get_download_budget() -> DownloadBudget:
+    """Get the limits shared by all downloads in this run"""
+    return _budget
+
+class _SegmentScheduler:
+    """Hand out download segments to connections and balance the tail
+
+    Connections take small segments in file order. Once none are left, an
+    idle connection steals the second half of the remaining bytes of the
+    segment expected to finish last. The number of connections grows while
+    each extra one still raises total throughput and shrinks when it stops
+    helping; the result is remembered per host.
+    """
+
+    def __init__(self, chunks: list, host: str):
+        self.chunks = chunks
+        self.host = host
+        self.active = {}  # chunk index -> (start time, received at start)
+        self.target = min(_host_connections.get(host, MAX_CHUNKS // 2), MAX_CHUNKS)
+        self.workers = 0
+        self.growing = True
+        self.best_rate = 0.0
+        self.last_bytes = None
+        self.last_time = None
+
+    def next_segment(self):
+        """Get the next segment to download, stealing work if none is left"""
+        for index, chunk in enumerate(self.chunks):
+            if index not in self.active and chunk['start'] + chunk['received'] <= chunk['end']:
+                return self._claim(index)
+        return self._steal()
+
+    def _claim(self, index: int):
+        chunk = self.chunks[index]
+        self.active[index] = (time.monotonic(), chunk['received'])
+        return index
+
+    def _steal(self):
+        """Split the slowest active segment and claim its second half"""
+        now = time.monotonic()
+        victim, slowest = None, 0.0
+        for index, (started, received_at_start) in self.active.items():
+            chunk = self.chunks[index]
+            remaining = chunk['end'] + 1 - (chunk['start'] + chunk['received'])
+            if remaining < MIN_STEAL_SIZE:
+                continue
+            rate = (chunk['received'] - received_at_start) / max(now - started, 1e-3)
+            finish = remaining / rate if rate > 0 else float('inf')
+            if victim is None or finish > slowest:
+                victim, slowest = index, finish
+                
+        if victim is None:
+            return None
+            
+        chunk = self.chunks[victim]
+        position = chunk['start'] + chunk['received']
+        split = position + (chunk['end'] + 1 - position) // 2
+        self.chunks.append({'start': split, 'end': chunk['end'], 'received': 0})
+        # The victim notices its new end on its next read and stops there
+        chunk['end'] = split - 1
+        return self._claim(len(self.chunks) - 1)
+
+    def release(self, index: int):
+        self.active.pop(index, None)
+
+    def should_retire(self) -> bool:
+        """Check whether a connection should stop after its current segment"""
+        return self.workers > self.target
+
+    def has_work(self) -> bool:
+        return any(chunk['start'] + chunk['received'] <= chunk['end'] for chunk in self.chunks)
+
+    def adapt(self, downloaded: int) -> bool:
+        """Adjust the connection target from measured throughput
+
+        Returns True when another connection should be started.
+        """
+        now = time.monotonic()
+        if self.last_time is None:
+            self.last_bytes, self.last_time = downloaded, now
+            return False
+            
+        rate = (downloaded - self.last_bytes) / max(now - self.last_time, 1e-3)
+        self.last_bytes, self.last_time = downloaded, now
+        
+        grow = False
+        if self.growing:
+            if rate > self.best_rate * 1.1:
+                # The last connection paid off, try one more
+                self.best_rate = rate
+                if self.target < MAX_CHUNKS and self.has_work():
+                    self.target += 1
+                    grow = True
+            else:
+                self.growing = False
+                if rate < self.best_rate * 0.9 and self.target > 1:
+                    # The last connection made things worse
+                    self.target -= 1
+                    
+        _host_connections[self.host] = self.target
+        return grow
+
+def compute_file_hash(file_path: Path) -> str:
+    """Compute the SHA256 of a file, memory-mapping it where possible"""
+    sha256_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                sha256_hash.update(mapped)
+        except (ValueError, OSError):
+            # Empty files and some filesystems cannot be mapped
+            buffer = bytearray(HASH_BLOCK_SIZE)
+            view = memoryview(buffer)
+            for size in iter(lambda: f.readinto(buffer), 0):
+                sha256_hash.update(view[:size])
+    return sha256_hash.hexdigest()
+
 def verify_file_hash(file_path: Path, expected_hash: str) -> bool:
     """Verify file integrity using SHA256"""
     if not file_path.exists():
         return False
         
     try:
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest() == expected_hash
+        return compute_file_hash(file_path) == expected_hash.lower()
     except:
         return False
 
-async def download_file_async(url: str, destination: Path, description: str, file_hash: str = None):
-    """Download a file asynchronously with multiple connections"""
+async def probe_remote_file(session: aiohttp.ClientSession, url: str, priority: int = 0) -> dict:
+    """Find out the size, validators and range support of a remote file
+
+    Tries HEAD first and falls back to a GET of bytes=0-0 when HEAD leaves
+    the size or range support unclear. Range support is remembered per host
+    so later downloads from the same server skip the extra request. Each
+    request holds a slot of the download budget.
+    """
+    budget = get_download_budget()
+    host = urlparse(url).netloc
+    info = {'total_size': 0, 'etag': None, 'last_modified': None, 'ranges': False, 'latency': None}
+    advertised = False
+    started = time.monotonic()
+    try:
+        async with budget.connection(priority), session.head(url) as response:
+            info['total_size'] = int(response.headers.get('content-length', 0))
+            info['etag'] = response.headers.get('etag')
+            info['last_modified'] = response.headers.get('last-modified')
+            advertised = response.headers.get('accept-ranges', '').lower() == 'bytes'
+            info['latency'] = time.monotonic() - started
+    except aiohttp.ClientResponseError:
+        # Some servers reject HEAD; the ranged GET below tells us the same
+        pass
+    
+    known = _host_ranges.get(host)
+    if info['total_size'] and (advertised or known is not None):
+        info['ranges'] = known if known is not None else True
+        return info
+        
+    headers = {'Range': 'bytes=0-0', 'Accept-Encoding': 'identity'}
+    started = time.monotonic()
+    async with budget.connection(priority), session.get(url, headers=headers) as response:
+        info['latency'] = info['latency'] or time.monotonic() - started
+        info['etag'] = info['etag'] or response.headers.get('etag')
+        info['last_modified'] = info['last_modified'] or response.headers.get('last-modified')
+        content_range = response.headers.get('content-range', '')
+        if response.status == 206 and '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+            info['ranges'] = True
+            info['total_size'] = int(total) if total.isdigit() else info['total_size']
+        else:
+            # The full body is on its way; leave it unread, the connection is dropped
+            info['ranges'] = False
+            info['total_size'] = info['total_size'] or int(response.headers.get('content-length', 0))
+            
+    _host_ranges[host] = info['ranges']
+    return info
+
+async def _sample_digest(session: aiohttp.ClientSession, url: str, total_size: int, priority: int = 0) -> str:
+    """Hash the tail of a remote file, where differing builds almost always differ"""
+    budget = get_download_budget()
+    start = max(0, total_size - MIRROR_SAMPLE_SIZE)
+    headers = {'Range': f'bytes={start}-{total_size - 1}', 'Accept-Encoding': 'identity'}
+    async with budget.connection(priority), session.get(url, headers=headers) as response:
+        if response.status != 206:
+            raise ValueError(f"Server ignored range request (HTTP {response.status})")
+        data = await response.read()
+        await budget.throttle(len(data), priority)
+        return hashlib.sha256(data).hexdigest()
+
+async def rank_sources(session: aiohttp.ClientSession, urls: list, priority: int = 0) -> list:
+    """Probe a file's mirrors concurrently and rank the usable ones
+
+    Returns (url, info) pairs ordered by probe latency. Mirrors that fail
+    the probe or report a different size than the catalog URL (or the first
+    mirror that answered) are dropped.
+    When several mirrors support ranges, the tail of the file is sampled
+    from each and only those agreeing with the majority are kept, so
+    ranges striped across them assemble into one consistent file.
+    """
+    results = await asyncio.gather(*(probe_remote_file(session, url, priority) for url in urls),
+                                   return_exceptions=True)
+    probed = [(url, info) for url, info in zip(urls, results) if not isinstance(info, BaseException)]
+    if not probed:
+        raise results[0]
+        
+    for url, info in zip(urls, results):
+        if isinstance(info, BaseException):
+            console.print(f"[yellow]Skipping mirror {urlparse(url).netloc}: {info}[/yellow]")
+            
+    # The first URL is the catalog's own and sets the expected size when it answers
+    reference = probed[0][1]
+    probed.sort(key=lambda source: source[1]['latency'] if source[1]['latency'] is not None else float('inf'))
+    sources = [(url, info) for url, info in probed if info['total_size'] == reference['total_size']]
+    for url, info in probed:
+        if info['total_size'] != reference['total_size']:
+            console.print(f"[yellow]Skipping mirror {urlparse(url).netloc}: size differs[/yellow]")
+    
+    ranged = [(url, info) for url, info in sources if info['ranges']]
+    if len(ranged) < 2 or not reference['total_size']:
+        return sources
+        
+    # Only stripe across mirrors serving identical bytes
+    digests = await asyncio.gather(*(_sample_digest(session, url, reference['total_size'], priority)
+                                     for url, _ in ranged), return_exceptions=True)
+    votes = {}
+    for digest in digests:
+        if not isinstance(digest, BaseException):
+            votes[digest] = votes.get(digest, 0) + 1
+    if not votes:
+        return sources[:1]
+    # Ties go to the catalog URL's content
+    preferred = next((digest for (url, _), digest in zip(ranged, digests) if url == urls[0]), digests[0])
+    majority = max(votes, key=lambda digest: (votes[digest], digest == preferred))
+    agreeing = [source for source, digest in zip(ranged, digests) if digest == majority]
+    for (url, _), digest in zip(ranged, digests):
+        if digest != majority:
+            console.print(f"[yellow]Skipping mirror {urlparse(url).netloc}: content differs[/yellow]")
+    return agreeing
+
+async def _download_stream(session: aiohttp.ClientSession, url: str, part_file: Path,
+                           progress: Progress, task, priority: int) -> str:
+    """Download a file over a single connection, returning its SHA256"""
+    budget = get_download_budget()
+    sha256_hash = hashlib.sha256()
+    downloaded = 0
+    async with budget.connection(priority):
+        async with session.get(url, headers={'Accept-Encoding': 'identity'}) as response:
+            with open(part_file, 'wb') as f:
+                async for data in response.content.iter_chunked(65536):
+                    await budget.throttle(len(data), priority)
+                    f.write(data)
+                    sha256_hash.update(data)
+                    downloaded += len(data)
+                    progress.update(task, completed=downloaded)
+    return sha256_hash.hexdigest()
+
+async def _download_segments(session: aiohttp.ClientSession, url: str, sources: list, description: str, part_file: Path,
+                             manifest_file: Path, info: dict, resume: bool, progress: Progress, task, priority: int) -> str:
+    """Download a file as ranged segments over several connections, returning its SHA256
+
+    Connections are spread over the given source URLs in rank order, and a
+    connection whose request fails moves on to the next source. Each range
+    is written in place into the preallocated part file; with resume, the
+    bytes received so far are recorded in the manifest file so a later run
+    only requests what is missing. Failed ranges are retried with backoff
+    from the offset they reached until RANGE_RETRIES or RETRY_BUDGET runs
+    out, which raises a DownloadError.
+    """
+    total_size = info['total_size']
+    
+    # Reuse the chunk layout of a previous attempt if the remote file is unchanged
+    manifest = _load_manifest(manifest_file) if resume else None
+    if (_can_resume(manifest, url, total_size, info['etag'], info['last_modified'])
+            and part_file.exists() and part_file.stat().st_size == total_size):
+        chunks = manifest['chunks']
+    else:
+        # Calculate segment ranges
+        chunks = []
+        for start in range(0, total_size, SEGMENT_SIZE):
+            end = min(start + SEGMENT_SIZE - 1, total_size - 1)
+            chunks.append({'start': start, 'end': end, 'received': 0})
+        
+        # Reserve the whole file up front so each range can be written in place
+        _preallocate(part_file, total_size)
+        manifest = {
+            'url': url,
+            'total_size': total_size,
+            'etag': info['etag'],
+            'last_modified': info['last_modified'],
+            'chunks': chunks
+        }
+    
+    resumed = sum(chunk['received'] for chunk in chunks)
+    if resumed:
+        console.print(f"[yellow]Resuming {description} from {format_size(float(resumed))}[/yellow]")
+    progress.update(task, completed=resumed)
+    
+    downloaded = resumed
+    last_save = time.time()
+    hasher = _PrefixHasher(part_file, chunks)
+    hasher.catch_up()
+    
+    def checkpoint(force=False):
+        nonlocal last_save
+        if resume and (force or time.time() - last_save >= MANIFEST_SAVE_INTERVAL):
+            _save_manifest(manifest_file, manifest)
+            last_save = time.time()
+    
+    async def download_chunk(chunk, source):
+        nonlocal downloaded
+        start = chunk['start'] + chunk['received']
+        end = chunk['end']
+        if start > end:
+            return
+        headers = {
+            'Range': f'bytes={start}-{end}',
+            'Accept-Encoding': 'identity'
+        }
+        
+        async with session.get(source, headers=headers) as response:
+            if response.status != 206:
+                # Use a single stream for this host from now on
+                _host_ranges[urlparse(source).netloc] = False
+                raise RangeNotSupported(f"Server ignored range request (HTTP {response.status})")
+            # Unbuffered, so the manifest never claims bytes still held in memory
+            with open(part_file, 'r+b', buffering=0) as f:
+                f.seek(start)
+                async for data in response.content.iter_chunked(65536):
+                    # The end moves down when another connection steals the tail
+                    offset = chunk['start'] + chunk['received']
+                    data = data[:chunk['end'] + 1 - offset]
+                    if data:
+                        await budget.throttle(len(data), priority)
+                        f.write(data)
+                        chunk['received'] += len(data)
+                        hasher.update(offset, data)
+                        downloaded += len(data)
+                        progress.update(task, completed=downloaded)
+                        checkpoint()
+                    if chunk['start'] + chunk['received'] > chunk['end']:
+                        break
+    
+    scheduler = _SegmentScheduler(chunks, ",".join(urlparse(source).netloc for source in sources))
+    budget = get_download_budget()
+    failures = []
+    attempts = {}
+    
+    def record_failure(index: int, source: str, error: Exception) -> float:
+        """Log a failed range request and return how long to back off"""
+        chunk = chunks[index]
+        attempts[index] = attempts.get(index, 0) + 1
+        failures.append({
+            'source': urlparse(source).netloc,
+            'start': chunk['start'],
+            'end': chunk['end'],
+            'offset': chunk['start'] + chunk['received'],
+            'attempt': attempts[index],
+            'error': str(error) or type(error).__name__
+        })
+        if len(failures) > RETRY_BUDGET or attempts[index] > RANGE_RETRIES:
+            raise DownloadError(f"Giving up after {len(failures)} failed range requests", failures)
+        return _retry_delay(attempts[index] - 1)
+    
+    async def worker(slot: int):
+        scheduler.workers += 1
+        try:
+            while not scheduler.should_retire():
+                source = sources[slot % len(sources)]
+                error = None
+                # Wait for a global slot before claiming work, so queued
+                # workers never hold segments others could steal
+                async with budget.connection(priority):
+                    index = scheduler.next_segment()
+                    if index is None:
+                        return
+                    try:
+                        await download_chunk(chunks[index], source)
+                    except Exception as e:
+                        if not _is_retryable(e):
+                            raise
+                        error = e
+                    finally:
+                        scheduler.release(index)
+                if error is not None:
+                    # The range keeps the bytes it already has; whichever
+                    # connection picks it up next continues from there
+                    await asyncio.sleep(record_failure(index, source, error))
+                    slot += 1
+        finally:
+            scheduler.workers -= 1
+    
+    # Download all missing ranges, recording progress even when interrupted
+    tasks = [asyncio.ensure_future(worker(slot)) for slot in range(scheduler.target)]
+    try:
+        while True:
+            done, pending = await asyncio.wait(tasks, timeout=ADAPT_INTERVAL,
+                                               return_when=asyncio.FIRST_EXCEPTION)
+            for finished in done:
+                if finished.exception():
+                    raise finished.exception()
+            if not pending:
+                break
+            if scheduler.adapt(downloaded):
+                tasks.append(asyncio.ensure_future(worker(len(tasks))))
+    finally:
+        # Stop the remaining ranges before recording how far each one got
+        for pending in tasks:
+            pending.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        checkpoint(force=True)
+    
+    # Verify every range was received in full
+    if any(chunk['received'] != chunk['end'] - chunk['start'] + 1 for chunk in chunks):
+        raise ValueError("Download chunks are incomplete or corrupted")
+        
+    hasher.catch_up()
+    return hasher.hexdigest()
+
+async def download_file_async(url: str, destination: Path, description: str, file_hash: str = None,
+                              resume: bool = True, use_cache: bool = True, session: aiohttp.ClientSession = None,
+                              progress: Progress = None, priority: int = 0, mirrors: list = None):
+    """Download a file, segmented across its mirrors when they allow ranges, checking its SHA256"""
+    part_file, manifest_file = _partial_paths(destination)
     try:
         start_time = time.time()
         
@@ -51,133 +725,117 @@ async def download_file_async(url: str, destination: Path, description: str, fil
         if destination.exists():
             destination.unlink()
             
-        # Constants for optimized download
-        CHUNK_SIZE = 1024 * 1024  # 1MB chunks
-        MAX_CHUNKS = 8  # Maximum concurrent connections
-        
-        # Configure TCP connector for better performance
-        connector = aiohttp.TCPConnector(
-            limit=MAX_CHUNKS,          # Maximum concurrent connections
-            force_close=True,          # Don't keep connections alive
-            enable_cleanup_closed=True, # Clean up closed connections
-            ssl=False,                 # Disable SSL for http
-            ttl_dns_cache=300,         # Cache DNS results
-            use_dns_cache=True,        # Enable DNS caching
-        )
-        
-        # Configure client session
-        timeout = aiohttp.ClientTimeout(
-            total=None,     # No total timeout
-            connect=60,     # Connection timeout
-            sock_read=30    # Socket read timeout
-        )
+        # Check the download cache before touching the network
+        if use_cache:
+            cached_file = lookup_cached_file(url, file_hash)
+            if cached_file and verify_file_hash(cached_file, cached_file.name):
+                restore_cached_file(cached_file, destination)
+                file_size = destination.stat().st_size
+                console.print(f"[bold green]✓ Using cached {description}[/bold green] [dim]({format_size(float(file_size))})[/dim]")
+                return True
+            elif cached_file:
+                console.print(f"[yellow]Cached copy of {description} is corrupted, downloading fresh copy[/yellow]")
+                discard_cached_file(cached_file.name)
         
-        async with aiohttp.ClientSession(
-            connector=connector,
-            timeout=timeout,
-            headers={'User-Agent': 'DevMatic/1.0'},
-            raise_for_status=True
-        ) as session:
-            # Get file size
-            async with session.head(url) as response:
-                total_size = int(response.headers.get('content-length', 0))
-                
-            if total_size == 0:
-                raise ValueError("Could not determine file size")
-                
-            # Calculate chunk ranges
-            chunk_size = max(CHUNK_SIZE, total_size // MAX_CHUNKS)
-            chunks = []
-            for start in range(0, total_size, chunk_size):
-                end = min(start + chunk_size - 1, total_size - 1)
-                chunks.append((start, end))
-                
-            # Progress bar setup
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[bold blue]{task.description:<20}"),
-                TextColumn("[bold green]{task.percentage:>3.1f}% [yellow]({task.elapsed:.1f}s)[/yellow]"),
-                BarColumn(bar_width=20),
-                DownloadColumn(),
-                TransferSpeedColumn(),
-                console=console,
-                transient=True,
-                expand=False,
-            ) as progress:
-                task = progress.add_task(
-                    f"[cyan]Downloading {description[:15]}{'...' if len(description) > 15 else ''}", 
-                    total=total_size,
-                )
-                
-                # Create temporary directory for chunks
-                temp_dir = destination.parent / f"temp_{destination.stem}"
-                if temp_dir.exists():
-                    shutil.rmtree(temp_dir)
-                temp_dir.mkdir()
-                
-                temp_files = []
-                downloaded = 0
-                
-                async def download_chunk(chunk_id, start, end):
-                    nonlocal downloaded
-                    headers = {
-                        'Range': f'bytes={start}-{end}',
-                        'Accept-Encoding': 'identity'
-                    }
-                    temp_file = temp_dir / f"part{chunk_id}"
-                    temp_files.append(temp_file)
-                    
-                    async with session.get(url, headers=headers) as response:
-                        with open(temp_file, 'wb') as f:
-                            async for data in response.content.iter_chunked(65536):
-                                f.write(data)
-                                downloaded += len(data)
-                                progress.update(task, completed=downloaded)
-                
-                # Download all chunks
-                await asyncio.gather(*(download_chunk(i, start, end) 
-                                    for i, (start, end) in enumerate(chunks)))
-                
-                # Verify all chunks exist and have correct size
-                expected_sizes = [(end - start + 1) for start, end in chunks]
-                actual_sizes = [temp_file.stat().st_size for temp_file in temp_files]
-                
-                if len(temp_files) != len(chunks) or any(a != e for a, e in zip(actual_sizes, expected_sizes)):
-                    raise ValueError("Download chunks are incomplete or corrupted")
-                
-                # Combine chunks into final file
-                with open(destination, 'wb') as outfile:
-                    for temp_file in sorted(temp_files, key=lambda x: int(x.stem[4:])):
-                        with open(temp_file, 'rb') as infile:
-                            shutil.copyfileobj(infile, outfile, length=65536)
-                
-                # Clean up temp directory
-                shutil.rmtree(temp_dir)
+        async with contextlib.AsyncExitStack() as stack:
+            if session is None:
+                # Standalone use: a private session for this download only
+                session = await stack.enter_async_context(aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(ssl=False),
+                    timeout=aiohttp.ClientTimeout(total=None, connect=60, sock_read=30),
+                    headers={'User-Agent': USER_AGENT},
+                    raise_for_status=True
+                ))
                 
-                # Verify final file size
-                if destination.stat().st_size != total_size:
-                    raise ValueError("Final file size does not match expected size")
+            # Get file size, validators and range support of every source
+            urls = [url] + [mirror for mirror in (mirrors or []) if mirror != url]
+            sources = await rank_sources(session, urls, priority)
+            info = dict(sources)[url] if url in dict(sources) else sources[0][1]
+            total_size = info['total_size']
+            segmented = total_size > 0 and any(source_info['ranges'] for _, source_info in sources)
                 
-                # Verify hash if provided
-                if file_hash and not verify_file_hash(destination, file_hash):
-                    raise ValueError("File hash verification failed")
+            # Progress bar setup, unless the caller shares its display across downloads
+            if progress is None:
+                progress = stack.enter_context(Progress(
+                    SpinnerColumn(),
+                    TextColumn("[bold blue]{task.description:<20}"),
+                    TextColumn("[bold green]{task.percentage:>3.1f}% [yellow]({task.elapsed:.1f}s)[/yellow]"),
+                    BarColumn(bar_width=20),
+                    DownloadColumn(),
+                    TransferSpeedColumn(),
+                    console=console,
+                    transient=True,
+                    expand=False,
+                ))
+            task = progress.add_task(
+                f"[cyan]Downloading {description[:15]}{'...' if len(description) > 15 else ''}", 
+                total=total_size or None,
+            )
+            stack.callback(progress.remove_task, task)
+            
+            digest = None
+            if segmented:
+                ranged = [source for source, source_info in sources if source_info['ranges']]
+                try:
+                    digest = await _download_segments(session, url, ranged, description, part_file, manifest_file,
+                                                      info, resume, progress, task, priority)
+                except RangeNotSupported:
+                    # Advertised range support that isn't there; the ranges are useless to resume from
+                    console.print(f"[yellow]{description}: server ignored range requests, using a single stream[/yellow]")
+                    for path in (part_file, manifest_file):
+                        if path.exists():
+                            path.unlink()
+                    progress.update(task, completed=0)
+            if digest is None:
+                digest = await _download_stream(session, sources[0][0], part_file, progress, task, priority)
+            
+            # Verify hash if provided, before the file ever reaches its final name
+            if file_hash and digest != file_hash.lower():
+                # A corrupt file must not be resumed on the next attempt
+                part_file.unlink()
+                raise ValueError("File hash verification failed")
+            
+            # Move the completed file into place
+            os.replace(part_file, destination)
+            if manifest_file.exists():
+                manifest_file.unlink()
+            
+            # Verify final file size
+            if total_size and destination.stat().st_size != total_size:
+                raise ValueError("Final file size does not match expected size")
+            
+            if use_cache:
+                store_cached_file(destination, digest, url)
                     
         # Show completion stats
         download_time = time.time() - start_time
         file_size = destination.stat().st_size
-        console.print(f"[bold green]✓ {description} downloaded successfully![/bold green] [dim]({format_size(file_size)} in {format_time(download_time)})[/dim]")
+        console.print(f"[bold green]✓ {description} downloaded successfully![/bold green] [dim]({format_size(float(file_size))} in {format_time(download_time)})[/dim]")
         return True
         
     except Exception as e:
         console.print(f"[bold red]✗ Error downloading {description}: {e}[/bold red]")
+        if isinstance(e, DownloadError):
+            console.print(f"[dim]{e.report()}[/dim]")
         if destination.exists():
             destination.unlink()
-        # Clean up temp directory if it exists
-        temp_dir = destination.parent / f"temp_{destination.stem}"
-        if temp_dir.exists():
-            shutil.rmtree(temp_dir)
+        # Keep partial ranges around for the next attempt when resuming
+        if resume and part_file.exists() and manifest_file.exists():
+            console.print("[yellow]Partial download kept, run again to resume[/yellow]")
+        else:
+            for path in (part_file, manifest_file):
+                if path.exists():
+                    path.unlink()
         return False
 
-def download_file(url: str, destination: Path, description: str, file_hash: str = None):
-    """Synchronous wrapper for async download"""
-    return asyncio.run(download_file_async(url, destination, description, file_hash)) 
\ No newline at end of file
+def download_file(url: str, destination: Path, description: str, file_hash: str = None, resume: bool = True,
+                  use_cache: bool = True, priority: int = 0, mirrors: list = None):
+    """Synchronous wrapper for async download on the shared HTTP client"""
+    client = get_http_client()
+    
+    async def run():
+        session = await client.get_session()
+        return await download_file_async(url, destination, description, file_hash, resume, use_cache,
+                                         session, priority=priority, mirrors=mirrors)
+        
+    return client.run(run())
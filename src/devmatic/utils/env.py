@@ -0,0 +1,222 @@
+"""
+SDK environment file for DevMatic
+
+Generates sdk.env with the home, bin and lib paths of every active SDK.
+The entries of each SDK are cached together with a fingerprint of its
+active version directory, so regenerating only looks at SDKs that
+changed. Inside env_batch() regeneration waits until the batch ends.
+
+The managers read it through one shared SdkEnv, which parses the file
+only when it changed and remembers the tool paths resolved from it.
+"""
+
+import os
+import re
+import json
+import threading
+import functools
+import contextlib
+from pathlib import Path
+from rich.console import Console
+
+from .paths import SDK_DIR, SDK_ENV_FILE, ENV_CACHE_FILE
+from .state import get_local_sdk_versions
+from .store import current_dir, current_version, version_dir
+
+console = Console()
+
+ENV_HEADER = [
+    "# DevMatic SDK Environment Variables",
+    "# This file is auto-generated - DO NOT EDIT MANUALLY",
+]
+
+_lock = threading.RLock()
+_batch_depth = 0
+_pending = False
+
+def _load_cache() -> dict:
+    """Load the cached entries, keyed by SDK name"""
+    try:
+        with open(ENV_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache(cache: dict):
+    """Atomically write the cached entries"""
+    tmp_file = ENV_CACHE_FILE.with_name(f"{ENV_CACHE_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, ENV_CACHE_FILE)
+
+def _fingerprint(sdk_name: str):
+    """Identify the active version directory; it changes on switches, reinstalls and top-level edits"""
+    version = current_version(sdk_name)
+    if version is None:
+        return None
+    try:
+        stat = version_dir(sdk_name, version).stat()
+    except (OSError, ValueError):
+        return None
+    return [version, stat.st_ino, stat.st_mtime_ns]
+
+def _sdk_entries(sdk_name: str) -> list:
+    """Compute the variables of one SDK"""
+    name = re.sub(r'[^A-Z0-9_]', '', sdk_name.upper().replace(' ', '_'))
+    # Stable across version switches, see store.current_dir
+    path = SDK_DIR.resolve() / sdk_name / current_dir(sdk_name).name
+    lines = [f"{name}_HOME={path}"]
+    if (path / "bin").exists():
+        lines.append(f"{name}_BIN={path / 'bin'}")
+    if (path / "lib").exists():
+        lines.append(f"{name}_LIB={path / 'lib'}")
+    return lines
+
+def _write_env_file() -> bool:
+    """Regenerate sdk.env, recomputing only the SDKs whose fingerprint changed"""
+    cache = _load_cache()
+    updated = {}
+    for sdk_name in sorted(get_local_sdk_versions()):
+        fingerprint = _fingerprint(sdk_name)
+        if fingerprint is None:
+            continue
+        cached = cache.get(sdk_name)
+        if cached and cached['fingerprint'] == fingerprint:
+            updated[sdk_name] = cached
+        else:
+            updated[sdk_name] = {'fingerprint': fingerprint, 'lines': _sdk_entries(sdk_name)}
+    
+    env_content = ENV_HEADER + [f"SDK_ROOT={SDK_DIR.resolve()}", ""]
+    for entry in updated.values():
+        env_content += entry['lines'] + [""]  # Empty line between SDKs
+    content = '\n'.join(env_content)
+    
+    try:
+        with open(SDK_ENV_FILE, 'r') as f:
+            unchanged = f.read() == content
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        SDK_ENV_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = SDK_ENV_FILE.with_name(f"{SDK_ENV_FILE.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w') as f:
+            f.write(content)
+        os.replace(tmp_file, SDK_ENV_FILE)
+    if updated != cache:
+        _save_cache(updated)
+    return True
+
+def update_env_file() -> bool:
+    """Update sdk.env with SDK paths, or schedule it when inside env_batch()"""
+    global _pending
+    with _lock:
+        if _batch_depth:
+            _pending = True
+            return True
+        try:
+            _write_env_file()
+            console.print("[green]✓ Updated SDK environment variables[/green]")
+            return True
+        except Exception as e:
+            console.print(f"[bold red]✗ Error updating environment variables: {e}[/bold red]")
+            return False
+
+@contextlib.contextmanager
+def env_batch():
+    """Defer update_env_file() calls and regenerate once when the outermost batch ends"""
+    global _batch_depth, _pending
+    with _lock:
+        _batch_depth += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _batch_depth -= 1
+            run = not _batch_depth and _pending
+            if run:
+                _pending = False
+        if run:
+            update_env_file()
+
+class SdkEnv:
+    """Parsed sdk.env, re-read only when its mtime or size changes
+
+    Values derived from the variables, such as a manager's tool paths,
+    are memoized with memoize() and dropped whenever the file changes.
+    """
+
+    def __init__(self, env_file: Path):
+        self.env_file = env_file
+        self._lock = threading.Lock()
+        self._signature = None
+        self._variables = {}
+        self._memo = {}
+
+    def _refresh(self):
+        """Parse the file again if it changed since the last look"""
+        try:
+            stat = self.env_file.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        if signature == self._signature:
+            return
+        self._signature = signature
+        self._memo = {}
+        self._variables = {}
+        if signature is None:
+            console.print("[red]sdk.env file not found[/red]")
+            return
+        with open(self.env_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    self._variables[key.strip()] = value.strip()
+
+    def variables(self) -> dict:
+        """Get the variables; the dict is shared, so don't modify it"""
+        with self._lock:
+            self._refresh()
+            return self._variables
+
+    def get(self, key: str, default=None):
+        """Get one variable"""
+        return self.variables().get(key, default)
+
+    def memoize(self, key, compute):
+        """Get compute() for key, computed once per version of the file
+
+        None results are not remembered, so a failed lookup runs again.
+        """
+        with self._lock:
+            self._refresh()
+            if key in self._memo:
+                return self._memo[key]
+        value = compute()
+        if value is not None:
+            with self._lock:
+                self._memo[key] = value
+        return value
+
+_sdk_env = None
+_sdk_env_lock = threading.Lock()
+
+def get_sdk_env() -> SdkEnv:
+    """Get the SdkEnv shared by the whole DevMatic run"""
+    global _sdk_env
+    with _sdk_env_lock:
+        if _sdk_env is None:
+            _sdk_env = SdkEnv(SDK_ENV_FILE)
+    return _sdk_env
+
+def load_sdk_env() -> dict:
+    """Load SDK environment variables from sdk.env"""
+    return get_sdk_env().variables()
+
+def sdk_tool(find):
+    """Memoize a manager's find_* function until sdk.env changes"""
+    @functools.wraps(find)
+    def wrapper():
+        return get_sdk_env().memoize(find, find)
+    return wrapper
@@ -0,0 +1,216 @@
+"""
+Deduplicated file store for DevMatic
+
+Optionally keeps one copy of every extracted file in a content-addressed
+store and hardlinks it into each SDK tree that contains it, so identical
+DLLs, stdlib modules and the like across versions take disk space once.
+Files in deduplicated trees must be replaced, never modified in place;
+DevMatic's own extractors always unlink before writing.
+"""
+
+import os
+import json
+import zlib
+import threading
+from pathlib import Path
+from rich.console import Console
+
+from .paths import FILE_STORE_DIR
+from .format import format_size
+from .staging import purge_trash
+
+console = Console()
+
+class FileStore:
+    """Content-addressed blobs named by SHA256, shared through hardlinks
+
+    Zip members are looked up by their CRC32 and size, the same identity
+    incremental upgrades rely on, through an index mapping them to blob
+    hashes; a hit is linked into place without extracting anything. Each
+    file is hashed once, when its content first enters the store.
+
+    The index also records each blob's size, mtime and inode as they were
+    when its CRC32 was last known to match. A blob whose signature changed
+    since, say through an edited SDK tree sharing it, has its CRC32
+    recomputed before it is linked again. Two different files with the
+    same CRC32 and size would still be taken for each other; that is the
+    risk incremental upgrades already accept.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.index_file = root / 'index.json'
+        self._lock = threading.Lock()
+        self._index = None
+        self._dirty = False
+
+    def _load(self) -> dict:
+        """Load the CRC32 and size to [hash, signature] index on first use"""
+        if self._index is None:
+            try:
+                with open(self.index_file, 'r') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def save(self):
+        """Atomically write the index if it changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.index_file.with_name(f"{self.index_file.name}.tmp")
+            with open(tmp_file, 'w') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_file, self.index_file)
+            self._dirty = False
+
+    def blob_path(self, file_hash: str) -> Path:
+        """Get the location of a blob"""
+        return self.root / file_hash[:2] / file_hash
+
+    def link_existing(self, crc: int, size: int, target: Path):
+        """Link a stored copy of a zip member into place, returning its SHA256
+
+        Returns None when the store holds no copy, or only one whose
+        content no longer matches the member.
+        """
+        key = f"{crc:08x}-{size}"
+        with self._lock:
+            entry = self._load().get(key)
+        if not entry:
+            return None
+        # Indexes written before signatures were recorded hold bare hashes
+        file_hash, signature = (entry, None) if isinstance(entry, str) else (entry[0], entry[1:])
+        blob = self.blob_path(file_hash)
+        current = _signature(blob)
+        if current is None or current[0] != size:
+            return None
+        if current != signature:
+            valid = _blob_crc(blob) == crc
+            with self._lock:
+                if self._index.get(key) == entry:
+                    if valid:
+                        self._index[key] = [file_hash, *current]
+                    else:
+                        del self._index[key]
+                    self._dirty = True
+            if not valid:
+                return None
+        try:
+            try:
+                target.unlink()
+            except FileNotFoundError:
+                pass
+            os.link(blob, target)
+            return file_hash
+        except OSError:
+            # Missing blob, or the link limit of this one is reached
+            return None
+
+    def adopt(self, path: Path, file_hash: str, crc: int, size: int):
+        """Take a freshly written file into the store, sharing an existing copy"""
+        blob = self.blob_path(file_hash)
+        try:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                # The first copy becomes the blob itself
+                os.link(path, blob)
+            except FileExistsError:
+                tmp_path = path.with_name(f"{path.name}.dedup")
+                os.link(blob, tmp_path)
+                os.replace(tmp_path, path)
+        except OSError:
+            # Another volume, or too many links; the file simply stays a copy
+            return
+        signature = _signature(blob)
+        with self._lock:
+            self._load()[f"{crc:08x}-{size}"] = [file_hash, *signature] if signature else file_hash
+            self._dirty = True
+
+    def adopt_tree(self, directory: Path, files: dict):
+        """Take the files of an extracted tree into the store
+
+        files is the tree's manifest "files" map, which already holds the
+        hash of every file, see manifest.complete_manifest.
+        """
+        for relative, entry in files.items():
+            self.adopt(directory / relative, entry['hash'], entry['crc'], entry['size'])
+
+    def collect_garbage(self):
+        """Delete blobs no SDK tree links to any more
+
+        A blob whose link count is one is referenced by the store alone.
+        Returns (blobs removed, bytes freed).
+        """
+        removed = 0
+        freed = 0
+        live = set()
+        if self.root.exists():
+            for shard in self.root.iterdir():
+                if not shard.is_dir():
+                    continue
+                for blob in shard.iterdir():
+                    stat = blob.stat()
+                    if stat.st_nlink > 1:
+                        live.add(blob.name)
+                        continue
+                    try:
+                        blob.unlink()
+                        removed += 1
+                        freed += stat.st_size
+                    except OSError:
+                        live.add(blob.name)
+        with self._lock:
+            index = self._load()
+            for key in [key for key, entry in index.items()
+                        if (entry if isinstance(entry, str) else entry[0]) not in live]:
+                del index[key]
+                self._dirty = True
+        self.save()
+        return removed, freed
+
+def _signature(blob: Path):
+    """Get a blob's (size, mtime, inode), or None when it is missing"""
+    try:
+        stat = blob.stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+def _blob_crc(blob: Path):
+    """Compute a blob's CRC32, or None when it can't be read"""
+    crc = 0
+    try:
+        with open(blob, 'rb') as f:
+            while chunk := f.read(1024 * 1024):
+                crc = zlib.crc32(chunk, crc)
+    except OSError:
+        return None
+    return crc
+
+_file_store = FileStore(FILE_STORE_DIR) if os.environ.get('DEVMATIC_DEDUP', '') not in ('', '0') else None
+
+def configure_file_store(enabled: bool = None):
+    """Turn the deduplicated file store on or off
+
+    None keeps the current setting, which defaults to the DEVMATIC_DEDUP
+    environment variable.
+    """
+    global _file_store
+    if enabled is None:
+        return
+    _file_store = FileStore(FILE_STORE_DIR) if enabled else None
+
+def get_file_store():
+    """Get the file store extractions should use, or None when disabled"""
+    return _file_store
+
+def collect_garbage():
+    """Drop unreferenced blobs whether or not the store is enabled for installs"""
+    # Replaced SDK trees in the trash still hold links until they're deleted
+    purge_trash(wait=True)
+    removed, freed = (_file_store or FileStore(FILE_STORE_DIR)).collect_garbage()
+    console.print(f"[green]✓ Removed {removed} unused files[/green] [dim]({format_size(freed)} freed)[/dim]")
+    return removed, freed
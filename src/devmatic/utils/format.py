@@ -4,8 +4,11 @@ Format utilities for DevMatic
 Provides functions for formatting time and file sizes.
 """
 
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3}
+
 def format_time(seconds):
     """Format seconds into minutes and seconds"""
+    seconds = float(seconds)
     if seconds < 60:
         return f"{int(seconds) if seconds.is_integer() else f'{seconds:.1f}'}s"
     minutes = int(seconds // 60)
@@ -14,6 +17,7 @@ def format_time(seconds):
 
 def format_size(size_bytes):
     """Format bytes into human readable size"""
+    size_bytes = float(size_bytes)
     for unit in ['B', 'KB', 'MB', 'GB']:
         if size_bytes < 1024:
             # Remove .0 if it's a whole number
@@ -21,4 +25,13 @@ def format_size(size_bytes):
             return f"{size_str} {unit}"
         size_bytes /= 1024
     size_str = str(int(size_bytes)) if size_bytes.is_integer() else f"{size_bytes:.1f}"
-    return f"{size_str} GB" 
\ No newline at end of file
+    return f"{size_str} GB" 
+
+def parse_size(text):
+    """Parse a human readable size such as 512K, 20MB or 1.5G into bytes"""
+    text = str(text).strip().upper()
+    number = text.rstrip('KMGB')
+    unit = text[len(number):]
+    if unit not in SIZE_UNITS:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(number) * SIZE_UNITS[unit])
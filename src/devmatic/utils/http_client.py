@@ -0,0 +1,133 @@
+"""
+HTTP client for DevMatic
+
+Provides one long-lived HTTP session shared by catalog fetches, downloads,
+installers and managers for the whole run.
+"""
+
+import json
+import atexit
+import asyncio
+import threading
+import concurrent.futures
+import aiohttp
+
+USER_AGENT = 'DevMatic/1.0'
+MAX_CONNECTIONS = 32  # Pool size across all hosts
+MAX_CONNECTIONS_PER_HOST = 8  # Matches download MAX_CHUNKS
+KEEPALIVE_TIMEOUT = 30  # Seconds an idle connection stays open
+DNS_CACHE_TTL = 300  # Seconds DNS results are reused
+
+class HttpClient:
+    """Shared aiohttp session running on a background event loop
+
+    Synchronous code hands coroutines to run(), which executes them on the
+    client's loop so every call reuses the same pooled keep-alive
+    connections and DNS cache instead of paying new handshakes.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Start the background event loop on first use"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="devmatic-http",
+                    daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Get the shared session; must be awaited on the client loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=MAX_CONNECTIONS,                    # Maximum connections overall
+                limit_per_host=MAX_CONNECTIONS_PER_HOST,  # Maximum connections per host
+                keepalive_timeout=KEEPALIVE_TIMEOUT,      # Keep idle connections for reuse
+                enable_cleanup_closed=True,               # Clean up closed connections
+                ttl_dns_cache=DNS_CACHE_TTL,              # Cache DNS results
+                use_dns_cache=True,                       # Enable DNS caching
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=None,     # No total timeout
+                connect=60,     # Connection timeout
+                sock_read=30    # Socket read timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                headers={'User-Agent': USER_AGENT},
+                raise_for_status=True
+            )
+        return self._session
+
+    def run(self, coro):
+        """Run a coroutine on the client loop and wait for its result"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        try:
+            # Poll so Ctrl-C is delivered to the main thread promptly
+            while True:
+                try:
+                    return future.result(timeout=0.2)
+                except concurrent.futures.TimeoutError:
+                    if future.done():
+                        raise
+        except KeyboardInterrupt:
+            # Let the coroutine clean up (e.g. save resume state) before bailing out
+            future.cancel()
+            try:
+                future.result(timeout=5)
+            except BaseException:
+                pass
+            raise
+
+    async def fetch_bytes_async(self, url: str, headers: dict = None) -> bytes:
+        session = await self.get_session()
+        async with session.get(url, headers=headers) as response:
+            return await response.read()
+
+    async def fetch_json_async(self, url: str, headers: dict = None):
+        return json.loads(await self.fetch_bytes_async(url, headers))
+
+    def fetch_bytes(self, url: str, headers: dict = None) -> bytes:
+        """Fetch a URL body using the shared session"""
+        return self.run(self.fetch_bytes_async(url, headers))
+
+    def fetch_json(self, url: str, headers: dict = None):
+        """Fetch and decode a JSON document using the shared session"""
+        return self.run(self.fetch_json_async(url, headers))
+
+    def close(self):
+        """Close the session and stop the background loop"""
+        if self._loop is None:
+            return
+        if self._session is not None and not self._session.closed:
+            try:
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(timeout=5)
+            except Exception:
+                pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+        self._thread = None
+        self._session = None
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Get the HTTP client shared by the whole DevMatic run"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+            atexit.register(_client.close)
+    return _client
@@ -0,0 +1,105 @@
+"""
+Install manifests for DevMatic
+
+Records which files each SDK installation consists of, with their size,
+modification time, CRC32 and SHA256, so upgrades can rewrite only what
+changed between versions and damaged files can be found and repaired.
+"""
+
+import os
+import json
+import zlib
+import shutil
+import hashlib
+from pathlib import Path
+
+from .paths import MANIFEST_DIR
+
+HASH_BLOCK_SIZE = 1024 * 1024  # Read size when hashing installed files
+
+def _manifest_file(sdk_name: str, version: str) -> Path:
+    """Get the manifest location of an SDK version"""
+    return MANIFEST_DIR / sdk_name / f"{version}.json"
+
+def load_install_manifest(sdk_name: str, version: str):
+    """Load the manifest recorded when an SDK version was installed, if any"""
+    manifest_file = _manifest_file(sdk_name, version)
+    if not manifest_file.exists():
+        return None
+    try:
+        with open(manifest_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_install_manifest(sdk_name: str, version: str, files: dict, source: str = None):
+    """Atomically record the files of an SDK installation
+
+    files maps paths relative to the install directory to a dict with the
+    file's "crc" (CRC32), "size", "mtime" (in nanoseconds) and "hash"
+    (SHA256), see complete_manifest. source is the URL of the archive the
+    files came from, which repairs extract them from again.
+    """
+    manifest_file = _manifest_file(sdk_name, version)
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = manifest_file.with_name(f"{manifest_file.name}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump({'name': sdk_name, 'version': version, 'source': source, 'files': files}, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+def remove_install_manifest(sdk_name: str, version: str = None):
+    """Forget the manifest of an SDK version, or of every version when none is given"""
+    if version is None:
+        shutil.rmtree(MANIFEST_DIR / sdk_name, ignore_errors=True)
+        return
+    manifest_file = _manifest_file(sdk_name, version)
+    if manifest_file.exists():
+        manifest_file.unlink()
+
+def hash_file(path: Path):
+    """Compute the SHA256 and CRC32 of a file in one read"""
+    sha256_hash = hashlib.sha256()
+    crc = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            sha256_hash.update(block)
+            crc = zlib.crc32(block, crc)
+    return sha256_hash.hexdigest(), crc
+
+def complete_manifest(directory: Path, files: dict) -> dict:
+    """Fill in the size and mtime of manifest entries from disk
+
+    Entries without a "hash" (files the extractor did not hash while
+    writing) are hashed now. Returns files.
+    """
+    for relative, entry in files.items():
+        path = directory / relative
+        if 'hash' not in entry:
+            entry['hash'], entry['crc'] = hash_file(path)
+        stat = path.stat()
+        entry['size'] = stat.st_size
+        entry['mtime'] = stat.st_mtime_ns
+    return files
+
+def scan_tree(directory: Path) -> dict:
+    """Build the manifest "files" map of every file in an installed tree"""
+    files = {path.relative_to(directory).as_posix(): {}
+             for path in directory.rglob('*') if path.is_file() and not path.is_symlink()}
+    return complete_manifest(directory, files)
+
+def check_file(directory: Path, relative: str, entry: dict, deep: bool = False):
+    """Compare an installed file with its manifest entry
+
+    The fast check compares size and mtime; deep re-hashes the content.
+    Returns None when the file is intact, otherwise what is wrong.
+    """
+    path = directory / relative
+    try:
+        stat = path.stat()
+    except OSError:
+        return "missing"
+    if stat.st_size != entry['size']:
+        return "size changed"
+    if deep:
+        return None if hash_file(path)[0] == entry['hash'] else "content changed"
+    return None if stat.st_mtime_ns == entry.get('mtime') else "modified"
@@ -0,0 +1,22 @@
+"""
+Path constants for DevMatic
+
+Defines where DevMatic keeps its metadata, downloads and SDKs.
+"""
+
+from pathlib import Path
+
+ROOT_DIR = Path("C:/DevMatic")
+DEVMATIC_DIR = ROOT_DIR / '.devmatic'
+DOWNLOAD_DIR = DEVMATIC_DIR / 'downloads'
+CACHE_DIR = DOWNLOAD_DIR / '.cache'
+APPS_JSON_FILE = DEVMATIC_DIR / 'apps.json'
+SDK_JSON_FILE = DEVMATIC_DIR / 'sdk.json'
+SDK_DIR = DEVMATIC_DIR / 'sdk'
+MANIFEST_DIR = DEVMATIC_DIR / 'manifests'
+TRASH_DIR = DOWNLOAD_DIR / '.trash'
+FILE_STORE_DIR = DEVMATIC_DIR / 'store'
+CATALOG_DIR = DEVMATIC_DIR / 'catalog'
+STATE_DB_FILE = DEVMATIC_DIR / 'state.db'
+SDK_ENV_FILE = ROOT_DIR / 'sdk.env'
+ENV_CACHE_FILE = DEVMATIC_DIR / 'env-cache.json'
@@ -6,16 +6,15 @@ Provides functions for managing SDK installations and metadata.
 
 from pathlib import Path
 from rich.status import Status
-import urllib.request
 
 import os
 import json
+import asyncio
+import contextlib
 import time
-import shutil
 import subprocess
 import ctypes
-import zipfile
-from datetime import datetime
+from functools import partial
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 from rich.table import Table
@@ -27,43 +26,53 @@ from rich.layout import Layout
 from rich.text import Text
 
 from .format import format_size, format_time
+from .catalog import load_catalogs
+from .state import record_install, remove_record
+from .env import update_env_file
+from .archive import (
+    is_tar_archive,
+    extract_tar,
+    stream_extract_tar_async,
+    extract_zip,
+    fetch_zip_members_async
+)
+from .manifest import load_install_manifest, save_install_manifest, complete_manifest, scan_tree
+from .staging import create_staging_dir, swap_into_place, discard_tree, purge_trash
+from .filestore import get_file_store
+from .store import version_dir, current_version, set_current_version
+from .paths import ROOT_DIR, DOWNLOAD_DIR, CACHE_DIR, APPS_JSON_FILE, SDK_JSON_FILE, SDK_DIR
 
-ROOT_DIR = Path("C:/DevMatic")
-DEVMATIC_DIR = ROOT_DIR / '.devmatic'
-DOWNLOAD_DIR = DEVMATIC_DIR / 'downloads'
-APPS_JSON_FILE = DEVMATIC_DIR / 'apps.json'
-SDK_JSON_FILE = DEVMATIC_DIR / 'sdk.json'
-SDK_DIR = DEVMATIC_DIR / 'sdk'
 
 console = Console()
 
 def ensure_directories_and_files():
     """Ensure necessary directories and files exist"""
     DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
     APPS_JSON_FILE.touch(exist_ok=True)
     SDK_JSON_FILE.touch(exist_ok=True)
     SDK_DIR.mkdir(parents=True, exist_ok=True)
+    # Finish deleting SDK versions replaced in an earlier session
+    purge_trash()
 
 def fetch_apps_data():
-    """Fetch Apps data from remote JSON with status indicator"""
+    """Fetch Apps data from the catalog cache with status indicator"""
     with Status("[bold blue]Fetching Apps...", spinner="dots") as status:
         try:
-            with urllib.request.urlopen("https://raw.githubusercontent.com/minimalistmg/DevMatic/main/src/devmatic/apps/apps.json") as response:
-                data = json.loads(response.read())
-                status.update("[bold green]✓ Apps Fetched Successfully!")
-                return data
+            data = load_catalogs()[0]
+            status.update("[bold green]✓ Apps Fetched Successfully!")
+            return data
         except Exception as e:
             status.update(f"[bold red]✗ Error Fetching Apps: {e}")
             raise RuntimeError(f"Failed to Fetch Apps: {e}")
 
 def fetch_sdk_data():
-    """Fetch SDK data from remote JSON with status indicator"""
+    """Fetch SDK data from the catalog cache with status indicator"""
     with Status("[bold blue]Fetching SDKs...", spinner="dots") as status:
         try:
-            with urllib.request.urlopen("https://raw.githubusercontent.com/minimalistmg/DevMatic/main/src/devmatic/apps/toolkit.json") as response:
-                data = json.loads(response.read())
-                status.update("[bold green]✓ SDKs Fetched Successfully!")
-                return data
+            data = load_catalogs()[1]
+            status.update("[bold green]✓ SDKs Fetched Successfully!")
+            return data
         except Exception as e:
             status.update(f"[bold red]✗ Error Fetching SDKs: {e}")
             raise RuntimeError(f"Failed to Fetch SDKs: {e}")
@@ -158,7 +167,7 @@ def show_app_menu():
             
         # Fetch SDK data
         sdk_data = fetch_sdk_data()
-        needed_sdks = [sdk for sdk in sdk_data if sdk['name'] in required_sdks]
+        needed_sdks = [sdk_data.get(name) for name in required_sdks if name in sdk_data]
         
         return show_sdk_menu(needed_sdks, selected_app['name'])
         
@@ -167,14 +176,14 @@ def show_app_menu():
         return None
 
 def show_sdk_menu(sdk_data, app_name):
-    """Display interactive SDK menu"""
+    """Display interactive SDK menu
+
+    Returns the confirmed (action, name, version, local version) tuples:
+    every SDK needing an install or update, or one picked from the list.
+    """
     margin = 2
     table_width = console.width - (margin * 2)
     
-    # Get local versions with existence check
-    local_versions = get_local_sdk_versions()
-    remote_names = {sdk["name"] for sdk in sdk_data}
-    
     # Create table
     table = Table(
         show_header=True,
@@ -197,33 +206,36 @@ def show_sdk_menu(sdk_data, app_name):
     sdk_menu_items = []
     
     for sdk in sdk_data:
-        name = sdk["name"]
-        new_version = sdk["version"]
-        local_version = local_versions.get(name)
+        name = sdk.name
+        new_version = sdk.version
+        local_version = sdk.installed_version
+        action = None
         
         if local_version:
             if local_version != new_version:
                 status = "⚠️ Update"
                 version_text = f"[yellow]v{local_version} → v{new_version}[/yellow]"
-                needs_action.append(("update", name, new_version, local_version))
+                action = ("update", name, new_version, local_version)
             else:
                 status = "✓ Ready"
                 version_text = f"[green]v{local_version}[/green]"
         else:
             status = "❌ Missing"
             version_text = f"[red]Not installed[/red]"
-            needs_action.append(("install", name, new_version, None))
+            action = ("install", name, new_version, None)
+        if action:
+            needs_action.append(action)
         
         table.add_row(
             status,
             name,
             version_text,
-            sdk['description']
+            sdk.description
         )
         
         sdk_menu_items.append({
             'name': f"{name} ({status})",
-            'action': needs_action[-1] if needs_action else None
+            'action': action
         })
     
     # Show table
@@ -231,6 +243,10 @@ def show_sdk_menu(sdk_data, app_name):
     console.print(table, justify="center")
     
     if needs_action:
+        # Everything missing or outdated goes through the install pipeline at once
+        if Confirm.ask(f"\n[cyan]Install/update all {len(needs_action)} SDKs?[/cyan]"):
+            return needs_action
+        
         console.print("\n[bold]Choose SDK to install/update:[/bold]")
         selected_sdk = select_with_arrows(sdk_menu_items, "[bold]Select SDK Action[/bold]")
         
@@ -244,79 +260,42 @@ def show_sdk_menu(sdk_data, app_name):
     
     return None
 
-def organize_sdk_directory(sdk_name: str, install_dir: Path, extracted_dir: Path = None):
-    """Organize SDK directory structure after extraction"""
-    try:
-        if not extracted_dir:
-            extracted_dir = install_dir
-            
-        # Check directory contents
-        contents = list(extracted_dir.iterdir())
-        
-        # Find the deepest directory containing actual SDK files
-        def find_sdk_root(path):
-            items = list(path.iterdir())
-            if len(items) == 1 and items[0].is_dir():
-                # Check if this single directory contains executables or important files
-                subdir_items = list(items[0].iterdir())
-                if any(item.suffix.lower() in ['.exe', '.dll', '.bat', '.cmd'] for item in subdir_items):
-                    return items[0]
-                # If not, go deeper
-                return find_sdk_root(items[0])
-            return path
-        
-        # Find the actual SDK root directory
-        sdk_root = find_sdk_root(extracted_dir)
-        
-        # Move all contents to install directory
-        for item in sdk_root.iterdir():
-            target = install_dir / item.name
-            if target.exists():
-                if target.is_dir():
-                    shutil.rmtree(target)
-                else:
-                    target.unlink()
-            shutil.move(str(item), str(target))
-        
-        # Verify the installation
-        installed_files = list(install_dir.iterdir())
-        if not installed_files:
-            console.print(f"[yellow]Warning: No files found in {install_dir}[/yellow]")
-            return False
-            
-        # Log the directory structure
-        console.print("[dim]Directory structure:[/dim]")
-        console.print(f"[dim]SDK/{sdk_name}/[/dim]")
-        for item in installed_files[:5]:  # Show first 5 items
-            console.print(f"[dim]  ├─ {item.name}[/dim]")
-        if len(installed_files) > 5:
-            console.print(f"[dim]  └─ ... ({len(installed_files) - 5} more files)[/dim]")
-            
-        return True
-        
-    except Exception as e:
-        console.print(f"[yellow]Warning: Error organizing SDK directory: {e}[/yellow]")
-        return False
+def install_sdk(sdk_name: str, file_path: Path, version: str, update_env: bool = True, progress: Progress = None, select=None, source_url: str = None):
+    """Install SDK from downloaded file
 
-def install_sdk(sdk_name: str, file_path: Path, version: str):
-    """Install SDK from downloaded file"""
+    Each version gets its own directory in the SDK store and becomes the
+    active one once installed. It is built in a staging directory and
+    swapped in when complete, so a failed install changes nothing; a
+    replaced copy of the same version is deleted in the background.
+    Pass update_env=False when installing several SDKs in one session and
+    regenerate the environment once at the end instead. select is the
+    SDK's member filter from archive.member_filter, if it declares one.
+    Every installed file is recorded in the version's install manifest,
+    together with source_url, the archive to repair it from.
+    """
+    staging = None
     try:
-        install_dir = DOWNLOAD_DIR / sdk_name
+        install_dir = version_dir(sdk_name, version)
         start_time = time.time()
         file_size = file_path.stat().st_size
+        file_ext = file_path.suffix.lower()
+        files = None
+        file_store = get_file_store()
         
-        # Clean up existing installation
-        if install_dir.exists():
-            try:
-                shutil.rmtree(install_dir)
-                time.sleep(1)
-                console.print(f"[yellow]Removed existing directory: {install_dir.name}[/yellow]")
-            except Exception as e:
-                console.print(f"[yellow]Warning: Could not remove existing directory: {e}[/yellow]")
-                return False, 0, 0
+        # Zips upgrade incrementally when the active version recorded its files
+        previous, previous_dir = _previous_install(sdk_name) if file_ext == '.zip' else (None, None)
+        # Without sharing, staging starts empty and unchanged files are copied in
+        share = _can_share(file_store, previous_dir, install_dir)
         
-        install_dir.mkdir(parents=True, exist_ok=True)
-        file_ext = file_path.suffix.lower()
+        if file_ext == '.exe':
+            # The installer writes to its target itself, so it can't be staged
+            discard_tree(install_dir)
+            target_dir = install_dir
+        else:
+            # Upgrades that may share files start from hardlinks to the active version's
+            staging = create_staging_dir(install_dir, clone_from=previous_dir if share else None)
+            target_dir = staging
+        target_dir.mkdir(parents=True, exist_ok=True)
         
         # Handle different file types
         if file_ext == '.msi':
@@ -324,7 +303,7 @@ def install_sdk(sdk_name: str, file_path: Path, version: str):
                 # Prepare command to extract MSI file
                 print(f"Extracting MSI file to {install_dir}")
                 print(f"File path: {file_path}")
-                extract_cmd = f'msiexec /a "{file_path}" /qb TARGETDIR="{install_dir}"'
+                extract_cmd = f'msiexec /a "{file_path}" /qb TARGETDIR="{target_dir}"'
                 # Run the extraction command
                 result = subprocess.run(
                     extract_cmd,
@@ -333,7 +312,7 @@ def install_sdk(sdk_name: str, file_path: Path, version: str):
                 )
                 
                 # Create a startup script to run GitHub Desktop with local data storage
-                BATCH_FILE = os.path.join(install_dir, "start-github-desktop.bat")
+                BATCH_FILE = os.path.join(target_dir, "start-github-desktop.bat")
                 with open(BATCH_FILE, "w") as f:
                     f.write(f'@echo off\n')
                     f.write(f'set "APPDATA={install_dir}"\n')
@@ -343,7 +322,7 @@ def install_sdk(sdk_name: str, file_path: Path, version: str):
                 time.sleep(5)  # Give installer time to finish
                 
                 # Verify installation
-                if not install_dir.exists() or not any(install_dir.iterdir()):
+                if not target_dir.exists() or not any(target_dir.iterdir()):
                     console.print("[bold red]✗ Installation verification failed[/bold red]")
                     return False, 0, 0
                     
@@ -393,8 +372,9 @@ def install_sdk(sdk_name: str, file_path: Path, version: str):
                 console.print(f"[bold red]✗ Installation error: {e}[/bold red]")
                 return False, 0, 0
                 
-        elif file_ext in ['.zip', '.gz', '.tgz', '.tar']:
-            with Progress(
+        elif file_ext == '.zip' or is_tar_archive(file_path.name):
+            # Reuse the caller's display when installs run alongside downloads
+            with contextlib.nullcontext(progress) if progress else Progress(
                 SpinnerColumn(),
                 TextColumn("[bold blue]{task.description:<20}"),
                 TextColumn("[bold green]{task.percentage:>3.1f}% [yellow]({task.elapsed:.1f}s)[/yellow]"),
@@ -405,65 +385,43 @@ def install_sdk(sdk_name: str, file_path: Path, version: str):
                 expand=False,
             ) as progress:
                 if file_ext == '.zip':
-                    with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                        # Get file list and total size for progress
-                        files = zip_ref.namelist()
-                        total_size = sum(zip_ref.getinfo(file).file_size for file in files)
-                        task = progress.add_task(
-                            f"[cyan]Extracting {sdk_name}...", 
-                            total=total_size
-                        )
-                        
-                        # Find root directory if it exists
-                        root_dir = None
-                        if files:
-                            first_path = files[0].split('/')
-                            if len(first_path) > 1 and all(f.startswith(f"{first_path[0]}/") for f in files):
-                                root_dir = first_path[0]
-                        
-                        # Extract files with progress
-                        extracted_size = 0
-                        for file in files:
-                            if file.startswith(('/', '..')):
-                                console.print(f"[yellow]Skipping unsafe path: {file}[/yellow]")
-                                continue
-                                
-                            try:
-                                if root_dir:
-                                    if file.startswith(f"{root_dir}/"):
-                                        # Remove root directory from path
-                                        target_path = file[len(root_dir)+1:]
-                                        if target_path:  # Skip the root directory itself
-                                            target = install_dir / target_path
-                                            # Create parent directory if it doesn't exist
-                                            target.parent.mkdir(parents=True, exist_ok=True)
-                                            # Extract file only if it's not a directory
-                                            if not file.endswith('/'):
-                                                with zip_ref.open(file) as source, open(target, 'wb') as target_file:
-                                                    target_file.write(source.read())
-                                                extracted_size += zip_ref.getinfo(file).file_size
-                                                progress.update(task, completed=extracted_size)
-                                else:
-                                    # No root directory, extract directly
-                                    target = install_dir / file
-                                    # Create parent directory if it doesn't exist
-                                    target.parent.mkdir(parents=True, exist_ok=True)
-                                    # Extract file only if it's not a directory
-                                    if not file.endswith('/'):
-                                        with zip_ref.open(file) as source, open(target, 'wb') as target_file:
-                                            target_file.write(source.read())
-                                        extracted_size += zip_ref.getinfo(file).file_size
-                                        progress.update(task, completed=extracted_size)
-                            except Exception as e:
-                                console.print(f"[yellow]Warning: Could not extract {file}: {e}[/yellow]")
-                                continue
+                    task = progress.add_task(f"[cyan]Extracting {sdk_name}...", total=None)
+                    files, written, removed = extract_zip(
+                        file_path, target_dir, select, previous,
+                        lambda completed, total: progress.update(task, completed=completed, total=total),
+                        file_store=file_store, previous_dir=None if share else previous_dir
+                    )
+                    progress.remove_task(task)
+                    if previous is not None:
+                        console.print(f"[dim]Upgraded: {written} files written, {removed} removed, {len(files) - written} unchanged[/dim]")
+                else:
+                    # Tar archives are read sequentially, so track compressed bytes consumed
+                    task = progress.add_task(f"[cyan]Extracting {sdk_name}...", total=file_size)
+                    extract_tar(file_path, target_dir, select,
+                                lambda completed: progress.update(task, completed=completed))
+                    progress.remove_task(task)
             
             if start_time:
                 extract_time = time.time() - start_time
                 file_size = file_path.stat().st_size
                 console.print(f"[bold green]✓ {sdk_name} installed successfully![/bold green] [dim]({format_size(file_size)} in {format_time(extract_time)})[/dim]")
         
-        # Clean up downloaded file
+        # Record every installed file; zip extraction already hashed its members
+        if files is None:
+            files = scan_tree(target_dir)
+            if file_store:
+                file_store.adopt_tree(target_dir, files)
+        complete_manifest(target_dir, files)
+        
+        # Swap the new version in; a replaced copy is deleted in the background
+        if staging is not None:
+            swap_into_place(staging, install_dir)
+        set_current_version(sdk_name, version)
+        if file_store:
+            file_store.save()
+        save_install_manifest(sdk_name, version, files, source_url)
+        
+        # Clean up downloaded file (a copy stays in the download cache)
         try:
             file_path.unlink()
         except Exception as e:
@@ -471,7 +429,8 @@ def install_sdk(sdk_name: str, file_path: Path, version: str):
         
         # Update version and environment file
         update_local_sdk_version(sdk_name, version)
-        update_env_file()
+        if update_env:
+            update_env_file()
         
         # Calculate total installation time
         install_time = time.time() - start_time
@@ -482,116 +441,153 @@ def install_sdk(sdk_name: str, file_path: Path, version: str):
         if file_path.exists():
             file_path.unlink()
         return False, 0, 0
+        
+    finally:
+        # A failed install leaves the previous version as it was
+        if staging is not None:
+            discard_tree(staging)
+
+def _previous_install(sdk_name: str):
+    """Find the base for an incremental upgrade: the active version's files
+
+    Returns (files, directory), the "files" map of the active version's
+    install manifest and its store directory, or (None, None).
+    """
+    active = current_version(sdk_name)
+    manifest = load_install_manifest(sdk_name, active) if active else None
+    if not manifest:
+        return None, None
+    return manifest['files'], version_dir(sdk_name, active)
+
+def _can_share(file_store, previous_dir: Path, install_dir: Path) -> bool:
+    """Whether an upgrade may hardlink the previous version's files
+
+    Only when the previous tree is being replaced or the file store
+    deduplicates files anyway; otherwise an edit in one installed version
+    would show up in the other.
+    """
+    return previous_dir is not None and (file_store is not None or previous_dir == install_dir)
+
+def _finish_install(sdk_name: str, version: str, size: int, start_time: float, update_env: bool):
+    """Record a completed installation and return (success, size, time)"""
+    if get_file_store():
+        get_file_store().save()
+    install_time = time.time() - start_time
+    console.print(f"[bold green]✓ {sdk_name} installed successfully![/bold green] [dim]({format_size(float(size))} in {format_time(install_time)})[/dim]")
+    
+    # Update version and environment file
+    update_local_sdk_version(sdk_name, version)
+    if update_env:
+        update_env_file()
+    return True, size, install_time
+
+async def install_sdk_streaming(sdk_name: str, url: str, version: str, file_hash: str = None,
+                                session=None, progress: Progress = None, priority: int = 0,
+                                update_env: bool = True, select=None):
+    """Install a tar-based SDK while it downloads
+
+    The archive is extracted straight from the HTTP stream into a staging
+    directory and never written to disk; the result is swapped in like in
+    install_sdk. Returns (success, size, time) like install_sdk.
+    """
+    loop = asyncio.get_running_loop()
+    install_dir = version_dir(sdk_name, version)
+    start_time = time.time()
+    staging = await loop.run_in_executor(None, create_staging_dir, install_dir)
+    try:
+        success, file_size = await stream_extract_tar_async(url, staging, sdk_name, file_hash,
+                                                            session=session, progress=progress,
+                                                            priority=priority, select=select)
+        if not success:
+            return False, 0, 0
+        files = await loop.run_in_executor(None, scan_tree, staging)
+        if get_file_store():
+            await loop.run_in_executor(None, get_file_store().adopt_tree, staging, files)
+            complete_manifest(staging, files)
+        await loop.run_in_executor(None, swap_into_place, staging, install_dir)
+        set_current_version(sdk_name, version)
+    except Exception as e:
+        console.print(f"[bold red]✗ Installation error: {e}[/bold red]")
+        return False, 0, 0
+    finally:
+        # Nothing is left behind unless the swap happened
+        discard_tree(staging)
+    
+    save_install_manifest(sdk_name, version, files, url)
+    return _finish_install(sdk_name, version, file_size, start_time, update_env)
+
+_trust_member_crc = os.environ.get('DEVMATIC_TRUST_ZIP_CRC', '') not in ('', '0')
+
+def configure_remote_installs(trust_member_crc: bool = None):
+    """Allow fetching single members of zips the catalog gives a SHA256 for
+
+    None keeps the current setting, which defaults to the
+    DEVMATIC_TRUST_ZIP_CRC environment variable.
+    """
+    global _trust_member_crc
+    if trust_member_crc is not None:
+        _trust_member_crc = trust_member_crc
+
+async def install_sdk_remote(sdk_name: str, url: str, version: str, select=None, session=None,
+                             progress: Progress = None, priority: int = 0, update_env: bool = True,
+                             file_hash: str = None):
+    """Install a zip-based SDK by fetching only the members it needs
+
+    Reads the archive's central directory with range requests and fetches
+    just the members the catalog filter selects and, when upgrading, only
+    those that changed since the installed version; see
+    fetch_zip_members_async. The result is staged and swapped in like in
+    install_sdk. Returns (success, size, time) like install_sdk, or None
+    when this is not possible and the full archive should be downloaded
+    instead.
+
+    Fetched members are only checked against their CRC32s, which guard
+    against corruption but not tampering, so an SDK whose catalog entry
+    has a SHA256 (file_hash) is always downloaded in full unless
+    configure_remote_installs allowed trusting the CRC32s.
+    """
+    if file_hash and not _trust_member_crc:
+        return None
+    loop = asyncio.get_running_loop()
+    install_dir = version_dir(sdk_name, version)
+    start_time = time.time()
+    previous, previous_dir = _previous_install(sdk_name)
+    share = _can_share(get_file_store(), previous_dir, install_dir)
+    staging = await loop.run_in_executor(None, partial(create_staging_dir, install_dir,
+                                                       clone_from=previous_dir if share else None))
+    try:
+        try:
+            size, files, written, removed = await fetch_zip_members_async(
+                url, staging, sdk_name, select, session=session, progress=progress,
+                priority=priority, previous=previous, file_store=get_file_store(),
+                previous_dir=None if share else previous_dir)
+        except Exception as e:
+            console.print(f"[yellow]Could not fetch the files of {sdk_name} separately ({e}), downloading the full archive[/yellow]")
+            return None
+        complete_manifest(staging, files)
+        await loop.run_in_executor(None, swap_into_place, staging, install_dir)
+        set_current_version(sdk_name, version)
+    except Exception as e:
+        console.print(f"[bold red]✗ Installation error: {e}[/bold red]")
+        return False, 0, 0
+    finally:
+        discard_tree(staging)
+    
+    save_install_manifest(sdk_name, version, files, url)
+    if previous is not None:
+        console.print(f"[dim]Upgraded: {written} files written, {removed} removed, {len(files) - written} unchanged[/dim]")
+    return _finish_install(sdk_name, version, size, start_time, update_env)
 
 def update_local_sdk_version(sdk_name: str, version: str, previous_version: str = None):
     """Update local SDK version record with metadata"""
     try:
-        sdk_file = Path('sdk.json')
-        data = []
-        
-        if sdk_file.exists():
-            with open(sdk_file, 'r') as f:
-                data = json.load(f)
-        
-        # Get current timestamp
-        current_time = datetime.now().isoformat()
-        
-        # Update or add SDK version with metadata
-        sdk_entry = next((item for item in data if item['name'] == sdk_name), None)
-        if sdk_entry:
-            # Store version history
-            sdk_entry.update({
-                'previous_version': sdk_entry['version'],
-                'version': version,
-                'last_updated': current_time,
-                'update_count': sdk_entry.get('update_count', 0) + 1,
-                'version_history': sdk_entry.get('version_history', []) + [{
-                    'from_version': sdk_entry['version'],
-                    'to_version': version,
-                    'update_date': current_time
-                }]
-            })
-        else:
-            data.append({
-                'name': sdk_name,
-                'version': version,
-                'previous_version': previous_version,
-                'installed_date': current_time,
-                'last_updated': current_time,
-                'update_count': 0,
-                'status': 'active',
-                'version_history': []
-            })
-            
-        # Write updated data with pretty formatting
-        with open(sdk_file, 'w') as f:
-            json.dump(data, f, indent=2, sort_keys=True)
-            
+        record_install(sdk_name, version, previous_version)
     except Exception as e:
         console.print(f"[bold red]✗ Error updating SDK version: {e}[/bold red]")
 
 def remove_sdk_version(sdk_name: str):
     """Remove SDK from version tracking"""
     try:
-        sdk_file = Path('sdk.json')
-        if not sdk_file.exists():
-            return
-            
-        with open(sdk_file, 'r') as f:
-            data = json.load(f)
-        
-        # Remove SDK from data
-        data = [sdk for sdk in data if sdk['name'] != sdk_name]
-        
-        # Write updated data
-        with open(sdk_file, 'w') as f:
-            json.dump(data, f, indent=2)
-            
+        remove_record(sdk_name)
     except Exception as e:
         console.print(f"[bold red]✗ Error removing SDK version: {e}[/bold red]")
-
-def update_env_file():
-    """Update .env file with SDK paths"""
-    try:
-        env_file = APP_DIR / "sdk.env"
-        sdk_dir = DOWNLOAD_DIR.resolve()  # Get absolute path
-        
-        # Prepare environment variables
-        env_content = [
-            "# DevMatic SDK Environment Variables",
-            "# This file is auto-generated - DO NOT EDIT MANUALLY",
-            f"SDK_ROOT={sdk_dir}",
-            ""  # Empty line at end
-        ]
-        
-        # Add paths for each installed SDK
-        if Path('sdk.json').exists():
-            with open('sdk.json', 'r') as f:
-                installed_sdks = json.load(f)
-                
-            for sdk in installed_sdks:
-                name = sdk['name'].upper().replace(' ', '_')
-                path = sdk_dir / sdk['name']
-                if path.exists():
-                    env_content.append(f"{name}_HOME={path}")
-                    
-                    # Add bin directory to PATH if it exists
-                    bin_dir = path / "bin"
-                    if bin_dir.exists():
-                        env_content.append(f"{name}_BIN={bin_dir}")
-                    
-                    # Add lib directory to PATH if it exists
-                    lib_dir = path / "lib"
-                    if lib_dir.exists():
-                        env_content.append(f"{name}_LIB={lib_dir}")
-                    
-                    env_content.append("")  # Empty line between SDKs
-        
-        # Write the file
-        with open(env_file, 'w') as f:
-            f.write('\n'.join(env_content))
-            
-        console.print("[green]✓ Updated SDK environment variables[/green]")
-        
-    except Exception as e:
-        console.print(f"[bold red]✗ Error updating environment variables: {e}[/bold red]") 
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Staged installs for DevMatic
+
+Installations are built in a staging directory next to their target and
+swapped into place with renames, so an SDK is never left half-installed.
+Replaced trees move to a trash directory that is emptied in the background.
+"""
+
+import os
+import uuid
+import shutil
+import threading
+from pathlib import Path
+from rich.console import Console
+
+from .paths import TRASH_DIR
+
+console = Console()
+
+_purge_lock = threading.Lock()
+_purge_thread = None
+
+def _link_file(source: str, target: str):
+    """Hardlink a file, copying when links are not supported"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+def _trash_path(path: Path) -> Path:
+    """Get a unique trash location for a directory"""
+    TRASH_DIR.mkdir(parents=True, exist_ok=True)
+    return TRASH_DIR / f"{path.name.lstrip('.')}-{uuid.uuid4().hex[:8]}"
+
+def create_staging_dir(target: Path, clone_from: Path = None) -> Path:
+    """Create a staging directory next to target
+
+    With clone_from, staging starts as a hardlinked copy of that tree (the
+    installed version) so an upgrade only writes the files that change.
+    The trees then share data, so only pass it when clone_from is about to
+    be replaced or its files are deduplicated anyway, and writers must
+    replace files rather than truncate them.
+    """
+    staging = target.with_name(f".{target.name}.staging")
+    if staging.exists():
+        # Left over from an interrupted install
+        discard_tree(staging)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if clone_from is not None and clone_from.is_dir():
+        shutil.copytree(clone_from, staging, symlinks=True, copy_function=_link_file)
+    else:
+        staging.mkdir()
+    return staging
+
+def swap_into_place(staging: Path, target: Path):
+    """Replace target with a staging directory
+
+    Two renames on the same volume: the old tree moves to the trash and the
+    staging directory takes its name. If the old tree cannot be moved (on
+    Windows, while a program from it is running) nothing changes and the
+    error is raised.
+    """
+    old = None
+    if target.exists():
+        old = _trash_path(target)
+        os.replace(target, old)
+    try:
+        os.replace(staging, target)
+    except OSError:
+        if old is not None:
+            os.replace(old, target)
+        raise
+    if old is not None:
+        purge_trash()
+
+def discard_tree(path: Path):
+    """Move a directory out of the way and delete it in the background"""
+    if not path.exists():
+        return
+    try:
+        os.replace(path, _trash_path(path))
+    except OSError:
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    purge_trash()
+
+def _empty_trash():
+    """Delete everything in the trash, leaving entries that are still in use"""
+    global _purge_thread
+    while True:
+        with _purge_lock:
+            items = list(TRASH_DIR.iterdir()) if TRASH_DIR.exists() else []
+            if not items:
+                _purge_thread = None
+                return
+        for item in items:
+            if item.is_dir() and not item.is_symlink():
+                shutil.rmtree(item, ignore_errors=True)
+            else:
+                try:
+                    item.unlink()
+                except OSError:
+                    pass
+        with _purge_lock:
+            if set(TRASH_DIR.iterdir()) == set(items):
+                # Nothing could be deleted and nothing new arrived; try again on the next run
+                _purge_thread = None
+                return
+
+def purge_trash(wait: bool = False):
+    """Empty the trash on a background thread, unless one is already at it
+
+    With wait, block until the trash is empty (or only holds entries that
+    are still in use).
+    """
+    global _purge_thread
+    with _purge_lock:
+        if _purge_thread is None:
+            _purge_thread = threading.Thread(target=_empty_trash, name="devmatic-trash", daemon=True)
+            _purge_thread.start()
+        thread = _purge_thread
+    if wait:
+        thread.join()
@@ -0,0 +1,167 @@
+"""
+Installed SDK state for DevMatic
+
+Records which SDK versions are installed, and their upgrade history, in a
+SQLite database. Every change is one transaction, so several DevMatic
+processes can install at the same time. sdk.json is rewritten from the
+database after each change for tools that still read it.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from rich.console import Console
+
+from .paths import STATE_DB_FILE, SDK_JSON_FILE
+
+console = Console()
+
+# Upgrades remembered per SDK, overridable through the environment
+HISTORY_LIMIT = int(os.environ.get('DEVMATIC_HISTORY_LIMIT', 20))
+BUSY_TIMEOUT = 30  # Seconds to wait for another process's transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sdks (
+    name TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    previous_version TEXT,
+    installed_date TEXT NOT NULL,
+    last_updated TEXT NOT NULL,
+    update_count INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'active'
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    from_version TEXT,
+    to_version TEXT NOT NULL,
+    update_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_name ON history (name, id);
+"""
+
+_local = threading.local()
+
+def _connect() -> sqlite3.Connection:
+    """Get this thread's connection, creating the database on first use"""
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        STATE_DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        connection = sqlite3.connect(STATE_DB_FILE, timeout=BUSY_TIMEOUT, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+        _import_json(connection)
+    return connection
+
+class _transaction:
+    """Write transaction taking the database lock up front"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+def _import_json(connection: sqlite3.Connection):
+    """Carry over the records of an sdk.json written before the database existed"""
+    try:
+        with open(SDK_JSON_FILE, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    with _transaction(connection):
+        if connection.execute("SELECT 1 FROM sdks LIMIT 1").fetchone():
+            return
+        for entry in data:
+            connection.execute(
+                "INSERT OR IGNORE INTO sdks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry['name'], entry['version'], entry.get('previous_version'),
+                 entry.get('installed_date') or entry.get('last_updated') or datetime.now().isoformat(),
+                 entry.get('last_updated') or datetime.now().isoformat(),
+                 entry.get('update_count', 0), entry.get('status', 'active'))
+            )
+            for item in entry.get('version_history', [])[-HISTORY_LIMIT:]:
+                connection.execute(
+                    "INSERT INTO history (name, from_version, to_version, update_date) VALUES (?, ?, ?, ?)",
+                    (entry['name'], item.get('from_version'), item['to_version'], item['update_date'])
+                )
+
+def _export_json(connection: sqlite3.Connection):
+    """Rewrite sdk.json from the database; called inside the write transaction"""
+    history = {}
+    for row in connection.execute("SELECT name, from_version, to_version, update_date FROM history ORDER BY id"):
+        history.setdefault(row['name'], []).append({
+            'from_version': row['from_version'],
+            'to_version': row['to_version'],
+            'update_date': row['update_date']
+        })
+    data = [dict(row, version_history=history.get(row['name'], []))
+            for row in connection.execute("SELECT * FROM sdks ORDER BY name")]
+    SDK_JSON_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = SDK_JSON_FILE.with_name(f"{SDK_JSON_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, SDK_JSON_FILE)
+
+def record_install(sdk_name: str, version: str, previous_version: str = None):
+    """Record that a version of an SDK is installed and active"""
+    connection = _connect()
+    now = datetime.now().isoformat()
+    with _transaction(connection):
+        row = connection.execute("SELECT version FROM sdks WHERE name = ?", (sdk_name,)).fetchone()
+        if row:
+            connection.execute(
+                "UPDATE sdks SET previous_version = version, version = ?, last_updated = ?, "
+                "update_count = update_count + 1 WHERE name = ?",
+                (version, now, sdk_name)
+            )
+            connection.execute(
+                "INSERT INTO history (name, from_version, to_version, update_date) VALUES (?, ?, ?, ?)",
+                (sdk_name, row['version'], version, now)
+            )
+            # Only the most recent upgrades are kept
+            connection.execute(
+                "DELETE FROM history WHERE name = ? AND id NOT IN "
+                "(SELECT id FROM history WHERE name = ? ORDER BY id DESC LIMIT ?)",
+                (sdk_name, sdk_name, HISTORY_LIMIT)
+            )
+        else:
+            connection.execute(
+                "INSERT INTO sdks (name, version, previous_version, installed_date, last_updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (sdk_name, version, previous_version, now, now)
+            )
+        _export_json(connection)
+
+def remove_record(sdk_name: str):
+    """Forget an SDK and its history"""
+    connection = _connect()
+    with _transaction(connection):
+        connection.execute("DELETE FROM sdks WHERE name = ?", (sdk_name,))
+        connection.execute("DELETE FROM history WHERE name = ?", (sdk_name,))
+        _export_json(connection)
+
+def get_record(sdk_name: str):
+    """Get an SDK's state as a dict, or None if it isn't recorded"""
+    row = _connect().execute("SELECT * FROM sdks WHERE name = ?", (sdk_name,)).fetchone()
+    return dict(row) if row else None
+
+def get_history(sdk_name: str) -> list:
+    """List an SDK's recorded upgrades, oldest first"""
+    rows = _connect().execute(
+        "SELECT from_version, to_version, update_date FROM history WHERE name = ? ORDER BY id", (sdk_name,))
+    return [dict(row) for row in rows]
+
+def get_local_sdk_versions() -> dict:
+    """Map every recorded SDK to its installed version"""
+    return {row['name']: row['version'] for row in _connect().execute("SELECT name, version FROM sdks")}
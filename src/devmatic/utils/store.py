@@ -0,0 +1,124 @@
+"""
+Versioned SDK store for DevMatic
+
+Keeps every installed version of an SDK side by side under
+sdk/<name>/<version>, with a "current" link (a symlink, or a junction on
+Windows without symlink rights) selecting the active one. Switching
+versions only replaces the link.
+"""
+
+import os
+import subprocess
+from pathlib import Path
+
+from .paths import SDK_DIR
+from .staging import discard_tree
+
+CURRENT_LINK = 'current'
+
+def sdk_home(sdk_name: str) -> Path:
+    """Get the store directory holding every version of an SDK"""
+    return SDK_DIR / sdk_name
+
+def version_dir(sdk_name: str, version: str) -> Path:
+    """Get the install directory of one SDK version"""
+    if not version or Path(version).name != version or version.startswith('.') or version == CURRENT_LINK:
+        raise ValueError(f"Invalid version: {version}")
+    return sdk_home(sdk_name) / version
+
+def current_dir(sdk_name: str) -> Path:
+    """Get the path that always points at the active version of an SDK"""
+    return sdk_home(sdk_name) / CURRENT_LINK
+
+def current_version(sdk_name: str):
+    """Get the active version of an SDK, or None when none is selected"""
+    try:
+        return Path(os.readlink(current_dir(sdk_name))).name
+    except OSError:
+        return None
+
+def installed_sdks() -> list:
+    """List the SDKs in the store that have an active version"""
+    if not SDK_DIR.is_dir():
+        return []
+    return sorted(item.name for item in SDK_DIR.iterdir() if current_version(item.name))
+
+def installed_versions(sdk_name: str) -> list:
+    """List the versions of an SDK present in the store"""
+    home = sdk_home(sdk_name)
+    if not home.is_dir():
+        return []
+    return sorted(item.name for item in home.iterdir()
+                  if item.name != CURRENT_LINK and not item.name.startswith('.') and item.is_dir())
+
+def is_version_installed(sdk_name: str, version: str) -> bool:
+    """Check whether a version is in the store and not empty"""
+    path = version_dir(sdk_name, version)
+    return path.is_dir() and any(path.iterdir())
+
+def _create_link(link: Path, target: Path):
+    """Point link at a directory, preferring a relative symlink"""
+    try:
+        os.symlink(target.name, link, target_is_directory=True)
+    except OSError:
+        if os.name != 'nt':
+            raise
+        # Symlinks need extra rights on Windows; junctions don't
+        try:
+            import _winapi
+            _winapi.CreateJunction(str(target), str(link))
+        except (ImportError, AttributeError):
+            subprocess.run(['cmd', '/c', 'mklink', '/J', str(link), str(target)],
+                           check=True, capture_output=True)
+
+def _remove_link(link: Path):
+    """Remove a symlink or junction without touching what it points at"""
+    try:
+        os.unlink(link)
+    except IsADirectoryError:
+        os.rmdir(link)
+    except PermissionError:
+        # Junctions are directories to the Windows API
+        os.rmdir(link)
+
+def set_current_version(sdk_name: str, version: str):
+    """Make an installed version the active one
+
+    The new link is created under a temporary name and renamed over the old
+    one, which is atomic where the platform allows replacing links.
+    """
+    target = version_dir(sdk_name, version)
+    if not target.is_dir():
+        raise ValueError(f"{sdk_name} {version} is not installed")
+    link = current_dir(sdk_name)
+    tmp_link = link.with_name(f".{CURRENT_LINK}.tmp")
+    if os.path.lexists(tmp_link):
+        _remove_link(tmp_link)
+    _create_link(tmp_link, target)
+    try:
+        os.replace(tmp_link, link)
+    except OSError:
+        # Windows can't rename over a junction; drop the old one first
+        if os.path.lexists(link):
+            _remove_link(link)
+        os.replace(tmp_link, link)
+
+def remove_version(sdk_name: str, version: str):
+    """Delete one version from the store, deselecting it if it was active"""
+    if current_version(sdk_name) == version:
+        _remove_link(current_dir(sdk_name))
+    discard_tree(version_dir(sdk_name, version))
+
+def stale_versions(sdk_name: str, keep: int = 1) -> list:
+    """List the inactive versions of an SDK beyond the keep most recently installed"""
+    active = current_version(sdk_name)
+    inactive = [version for version in installed_versions(sdk_name) if version != active]
+    inactive.sort(key=lambda version: version_dir(sdk_name, version).stat().st_mtime, reverse=True)
+    return inactive[max(keep, 0):]
+
+def remove_sdk_store(sdk_name: str):
+    """Delete every version of an SDK"""
+    link = current_dir(sdk_name)
+    if os.path.lexists(link):
+        _remove_link(link)
+    discard_tree(sdk_home(sdk_name))
@@ -0,0 +1,163 @@
+"""
+Installation checks for DevMatic
+
+Compares installed SDKs against their install manifests and restores
+damaged files from the archive they were installed from.
+"""
+
+import os
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+from .archive import extract_tar, extract_zip, fetch_zip_members_async, is_tar_archive, stream_extract_tar_async
+from .cache import lookup_cached_file
+from .http_client import get_http_client
+from .manifest import load_install_manifest, save_install_manifest, check_file, complete_manifest
+from .staging import discard_tree
+from .store import installed_sdks, installed_versions, version_dir
+
+console = Console()
+
+VERIFY_THREADS = 8  # Files checked at the same time
+VERIFY_BATCH_FILES = 512  # Files checked per task
+
+def _check_files(directory: Path, entries: list, deep: bool) -> dict:
+    """Check a batch of (relative path, entry) pairs, returning the damaged ones"""
+    damaged = {}
+    for relative, entry in entries:
+        problem = check_file(directory, relative, entry, deep)
+        if problem:
+            damaged[relative] = problem
+    return damaged
+
+def _restore_members(sdk_name: str, source: str, directory: Path, wanted: set):
+    """Write the wanted members of an SDK's archive below directory
+
+    The archive comes from the download cache when it is still there.
+    Otherwise zips fetch just those members with range requests, and tars
+    are streamed again with everything else skipped.
+    """
+    select = lambda relative: relative in wanted
+    cached = lookup_cached_file(source)
+    if cached and is_tar_archive(source):
+        extract_tar(cached, directory, select)
+    elif cached:
+        extract_zip(cached, directory, select)
+    else:
+        client = get_http_client()
+
+        async def fetch():
+            session = await client.get_session()
+            if is_tar_archive(source):
+                success, _ = await stream_extract_tar_async(source, directory, sdk_name, session=session,
+                                                            select=select)
+                if not success:
+                    raise ValueError(f"could not stream {source}")
+            else:
+                await fetch_zip_members_async(source, directory, sdk_name, select, session=session)
+
+        client.run(fetch())
+
+def repair_files(sdk_name: str, version: str, manifest: dict, damaged: list) -> list:
+    """Restore damaged files of an archive-based SDK
+
+    The damaged members are written to a scratch folder next to the
+    version (see _restore_members), and each one that comes back exactly
+    as recorded replaces the damaged file. Returns the paths that were
+    restored.
+    """
+    source = manifest.get('source')
+    if not source or not (source.lower().endswith('.zip') or is_tar_archive(source)):
+        console.print(f"[yellow]{sdk_name}: only zip and tar based SDKs can be repaired in place, reinstall it instead[/yellow]")
+        return []
+
+    directory = version_dir(sdk_name, version)
+    scratch = directory.with_name(f".{version}.repair")
+    discard_tree(scratch)
+    scratch.mkdir(parents=True)
+    try:
+        _restore_members(sdk_name, source, scratch, set(damaged))
+        # Keep only files that came back exactly as recorded
+        restored = complete_manifest(scratch, {relative: {} for relative in damaged
+                                               if (scratch / relative).is_file()})
+        repaired = []
+        for relative, entry in restored.items():
+            if entry['hash'] == manifest['files'][relative]['hash']:
+                target = directory / relative
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(scratch / relative, target)
+                manifest['files'][relative] = complete_manifest(directory, {relative: entry})[relative]
+                repaired.append(relative)
+    finally:
+        discard_tree(scratch)
+    save_install_manifest(sdk_name, version, manifest['files'], source)
+    return repaired
+
+def verify_sdks(names: list = None, deep: bool = False, repair: bool = False) -> bool:
+    """Check installed SDKs against their manifests, optionally repairing them
+
+    Every installed version with a manifest is checked, not only the
+    active one. The fast mode compares size and mtime, deep re-hashes every
+    file. All SDKs are checked in parallel. Returns True when everything is intact
+    (after repairs).
+    """
+    names = names or installed_sdks()
+    manifests = {}
+    for name in names:
+        found = False
+        for version in installed_versions(name):
+            manifest = load_install_manifest(name, version)
+            if manifest:
+                manifests[name, version] = manifest
+                found = True
+        if not found:
+            console.print(f"[yellow]{name}: no install manifest, skipping[/yellow]")
+    
+    damaged = {key: {} for key in manifests}
+    with ThreadPoolExecutor(max_workers=VERIFY_THREADS) as pool:
+        futures = []
+        for (name, version), manifest in manifests.items():
+            entries = list(manifest['files'].items())
+            for start in range(0, len(entries), VERIFY_BATCH_FILES):
+                batch = entries[start:start + VERIFY_BATCH_FILES]
+                futures.append(((name, version), pool.submit(_check_files, version_dir(name, version), batch, deep)))
+        for key, future in futures:
+            damaged[key].update(future.result())
+    
+    table = Table(box=box.ROUNDED, border_style="blue", header_style="bold cyan")
+    table.add_column("SDK", style="bright_white")
+    table.add_column("Version", style="yellow")
+    table.add_column("Files", justify="right")
+    table.add_column("Damaged", justify="right")
+    table.add_column("Status")
+    
+    intact = True
+    for (name, version), manifest in manifests.items():
+        problems = damaged[name, version]
+        for relative, problem in sorted(problems.items())[:10]:
+            console.print(f"[dim]{name} {version}: {relative} ({problem})[/dim]")
+        if len(problems) > 10:
+            console.print(f"[dim]{name} {version}: ... and {len(problems) - 10} more[/dim]")
+            
+        status = "[green]✓ OK[/green]"
+        if problems and repair:
+            try:
+                repaired = repair_files(name, version, manifest, list(problems))
+            except Exception as e:
+                console.print(f"[red]{name} {version}: repair failed: {e}[/red]")
+                repaired = []
+            if len(repaired) == len(problems):
+                status = "[green]✓ Repaired[/green]"
+            else:
+                status = f"[red]✗ {len(problems) - len(repaired)} unrepaired[/red]"
+                intact = False
+        elif problems:
+            status = "[red]✗ Damaged[/red]"
+            intact = False
+        table.add_row(name, version, str(len(manifest['files'])), str(len(problems)), status)
+    
+    console.print(table)
+    return intact
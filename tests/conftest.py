@@ -0,0 +1,129 @@
+"""
+Shared fixtures for the DevMatic tests
+
+RangeServer stands in for download hosts and mirrors: a local aiohttp
+server with switchable range support and injectable connection drops.
+"""
+
+import sys
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from devmatic.utils import archive, cache, download  # noqa: E402
+
+
+class RangeServer:
+    """Serve byte strings by path, honouring Range headers unless told not to
+
+    ranges=False answers ranged GETs with the whole file; advertise controls
+    the Accept-Ranges header on HEAD independently. With drops=N the next N
+    GETs longer than drop_after bytes are cut off after drop_after bytes.
+    Every request is logged as (method, path, range header).
+    """
+
+    def __init__(self, files: dict, ranges: bool = True, advertise: bool = None,
+                 drops: int = 0, drop_after: int = 0, status: int = None):
+        self.files = files
+        self.ranges = ranges
+        self.advertise = ranges if advertise is None else advertise
+        self.drops = drops
+        self.drop_after = drop_after
+        self.status = status
+        self.log = []
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self.port = None
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}/{path}"
+
+    async def _handle(self, request: web.Request):
+        self.log.append((request.method, request.path, request.headers.get('Range')))
+        if self.status:
+            return web.Response(status=self.status)
+        data = self.files.get(request.path.lstrip('/'))
+        if data is None:
+            return web.Response(status=404)
+        headers = {'ETag': '"test"'}
+        if self.advertise:
+            headers['Accept-Ranges'] = 'bytes'
+        if request.method == 'HEAD':
+            headers['Content-Length'] = str(len(data))
+            return web.Response(headers=headers)
+            
+        status, body = 200, data
+        header = request.headers.get('Range')
+        if header and self.ranges:
+            start, _, end = header[len('bytes='):].partition('-')
+            start, end = int(start), min(int(end) if end else len(data) - 1, len(data) - 1)
+            status, body = 206, data[start:end + 1]
+            headers['Content-Range'] = f"bytes {start}-{end}/{len(data)}"
+        headers['Content-Length'] = str(len(body))
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        if self.drops and len(body) > self.drop_after:
+            self.drops -= 1
+            await response.write(body[:self.drop_after])
+            request.transport.abort()
+            return response
+        await response.write(body)
+        await response.write_eof()
+        return response
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_route('*', '/{path:.*}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+@pytest.fixture
+def range_server():
+    """Start RangeServers for a test and stop them afterwards"""
+    servers = []
+
+    def start(files: dict, **options) -> RangeServer:
+        server = RangeServer(files, **options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture(autouse=True)
+def fresh_download_state(monkeypatch):
+    """Forget per-host state between tests and retry without waiting"""
+    monkeypatch.setattr(download, '_host_ranges', {})
+    monkeypatch.setattr(download, '_host_connections', {})
+    monkeypatch.setattr(download, '_retry_delay', lambda attempt: 0)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Point the download cache at a temporary folder"""
+    root = tmp_path / 'cache'
+    monkeypatch.setattr(cache, 'CACHE_DIR', root)
+    monkeypatch.setattr(cache, 'CACHE_INDEX_FILE', root / 'index.json')
+    monkeypatch.setattr(cache, 'CACHE_LOCK_FILE', root / 'index.lock')
+    monkeypatch.setattr(archive, 'CACHE_DIR', root)
+    return root
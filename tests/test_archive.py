@@ -0,0 +1,190 @@
+"""Tests for the remote zip index parser and ranged member fetching"""
+
+import io
+import os
+import struct
+import asyncio
+import hashlib
+import concurrent.futures
+import tarfile
+import zipfile
+
+import pytest
+
+from devmatic.utils import archive
+
+
+def _zip(files: dict, method=zipfile.ZIP_DEFLATED) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', method) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _tar(files: dict, links: dict = None) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tf:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+        for name, target in (links or {}).items():
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tf.addfile(info)
+    return buffer.getvalue()
+
+
+def _parse(data: bytes, tail_size: int):
+    async def read_range(start, end):
+        return data[start:end + 1]
+    tail_offset = max(0, len(data) - tail_size)
+    return asyncio.run(archive.parse_zip_index(data[tail_offset:], tail_offset, read_range))
+
+
+def _check_index(data: bytes, entries: list):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        expected = {info.filename: info for info in zf.infolist()}
+    assert {entry.name for entry in entries} == set(expected)
+    for entry in entries:
+        info = expected[entry.name]
+        assert (entry.crc, entry.file_size, entry.compress_size, entry.header_offset, entry.method) == \
+            (info.CRC, info.file_size, info.compress_size, info.header_offset, info.compress_type)
+    # Members are contiguous in file order, up to the central directory
+    for current, following in zip(entries, entries[1:]):
+        assert current.end == following.header_offset
+
+
+def test_parse_index_from_tail():
+    data = _zip({'sdk/bin/tool.exe': os.urandom(5000), 'sdk/readme.txt': b'hello' * 100, 'sdk/lib/': b''})
+    _check_index(data, _parse(data, 64 * 1024))
+
+
+def test_parse_index_beyond_tail():
+    data = _zip({f'sdk/{i}.txt': os.urandom(200) for i in range(300)}, zipfile.ZIP_STORED)
+    # The central directory starts before the tail and is fetched separately
+    _check_index(data, _parse(data, 100))
+
+
+def test_parse_zip64_end_record():
+    # More members than the classic record can count forces the zip64 one
+    data = _zip({f'{i}': b'' for i in range(0x10000 + 5)}, zipfile.ZIP_STORED)
+    entries = _parse(data, 64 * 1024)
+    assert len(entries) == 0x10000 + 5
+    _check_index(data, entries)
+
+
+def test_zip64_extra_field():
+    extra = struct.pack('<HHQQQ', 0x0001, 24, 5_000_000_000, 4_000_000_000, 6_000_000_000)
+    assert archive._zip64_sizes(extra, 0xFFFFFFFF, 0xFFFFFFFF, 0xFFFFFFFF) == \
+        (5_000_000_000, 4_000_000_000, 6_000_000_000)
+    # Only saturated fields are present, in order
+    extra = struct.pack('<HHHHQ', 0x5455, 0, 0x0001, 8, 7_000_000_000)
+    assert archive._zip64_sizes(extra, 10, 20, 0xFFFFFFFF) == (10, 20, 7_000_000_000)
+
+
+def test_fetch_selected_members(tmp_path, range_server):
+    files = {f'sdk/bin/{i}.dll': os.urandom(20000) for i in range(20)}
+    files.update({f'sdk/docs/{i}.html': os.urandom(20000) for i in range(20)})
+    server = range_server({'sdk.zip': _zip(files)})
+    select = archive.member_filter(include=['bin'])
+    
+    downloaded, manifest, written, removed = asyncio.run(archive.fetch_zip_members_async(
+        server.url('sdk.zip'), tmp_path, 'sdk', select))
+    
+    assert written == 20 and removed == 0
+    assert sorted(manifest) == sorted(f'bin/{i}.dll' for i in range(20))
+    for i in range(20):
+        assert (tmp_path / 'bin' / f'{i}.dll').read_bytes() == files[f'sdk/bin/{i}.dll']
+    assert not (tmp_path / 'docs').exists()
+    assert downloaded < len(server.files['sdk.zip']) * 2 // 3
+
+
+def test_stream_tar_resumes_and_caches(tmp_path, range_server, cache_dir):
+    files = {f'sdk/bin/{i}.bin': os.urandom(50000) for i in range(10)}
+    files['sdk/readme.txt'] = b'sdk'
+    data = _tar(files)
+    server = range_server({'sdk.tar.gz': data}, drops=2, drop_after=len(data) // 3)
+    digest = hashlib.sha256(data).hexdigest()
+
+    success, downloaded = asyncio.run(archive.stream_extract_tar_async(
+        server.url('sdk.tar.gz'), tmp_path / 'sdk', 'sdk', digest, use_cache=True))
+
+    assert success and downloaded == len(data)
+    ranges = [entry[2] for entry in server.log]
+    assert ranges[0] is None and all(r and r != 'bytes=0-' for r in ranges[1:])
+    for i in range(10):
+        assert (tmp_path / 'sdk' / 'bin' / f'{i}.bin').read_bytes() == files[f'sdk/bin/{i}.bin']
+    assert (cache_dir / digest).read_bytes() == data
+    assert not list(cache_dir.glob('*.tmp'))
+
+
+@pytest.mark.skipif(not hasattr(tarfile, 'data_filter'), reason="needs tarfile extraction filters")
+def test_stream_tar_keeps_inner_links(tmp_path, range_server):
+    data = _tar({'sdk/lib/libx.so.1': b'x' * 100, 'sdk/readme.txt': b'sdk'},
+                {'sdk/lib/libx.so': 'libx.so.1', 'sdk/lib/evil': '../../../etc/passwd'})
+    server = range_server({'sdk.tar.gz': data})
+
+    success, _ = asyncio.run(archive.stream_extract_tar_async(
+        server.url('sdk.tar.gz'), tmp_path / 'sdk', 'sdk'))
+
+    assert success
+    link = tmp_path / 'sdk' / 'lib' / 'libx.so'
+    assert link.is_symlink() and link.read_bytes() == b'x' * 100
+    assert not os.path.lexists(tmp_path / 'sdk' / 'lib' / 'evil')
+
+
+@pytest.mark.parametrize('names, kept, dropped, written', [
+    (['bin/x.exe', 'docs/z'], ['bin/x.exe'], ['docs'], 1),
+    (['top/bin/x.exe', 'top/docs/z'], ['bin/x.exe'], ['docs', 'top'], 1),
+    # A root two folders down could still be 'a' when a/b/docs/z arrives
+    (['a/b/bin/x', 'a/b/docs/z', 'a/b/y'], ['bin/x', 'y'], ['docs', 'a'], 3),
+])
+def test_tar_filter_applies_below_sdk_root(tmp_path, names, kept, dropped, written):
+    data = _tar({name: name.encode() for name in names})
+    select = archive.member_filter(exclude=['docs'])
+
+    sizes = []
+    archive.extract_tar_stream(io.BytesIO(data), tmp_path, sizes.append, select)
+
+    # Excluded members don't reach the disk unless the root is still open
+    assert len(sizes) == written
+    for relative in kept:
+        assert (tmp_path / relative).is_file()
+    for relative in dropped:
+        assert not (tmp_path / relative).exists()
+
+
+def test_stream_tar_root_known_only_at_the_end(tmp_path, range_server):
+    # The stray top-level file moves the root up after top/docs was skipped
+    data = _tar({'top/bin/x.exe': b'x', 'top/docs/z': b'z', 'notes.txt': b'n'})
+    server = range_server({'sdk.tar.gz': data})
+    select = archive.member_filter(exclude=['docs'])
+
+    with pytest.raises(archive.SdkRootMoved):
+        archive.extract_tar_stream(io.BytesIO(data), tmp_path / 'local', select=select)
+
+    success, _ = asyncio.run(archive.stream_extract_tar_async(
+        server.url('sdk.tar.gz'), tmp_path / 'sdk', 'sdk', select=select))
+
+    assert success and len(server.log) == 2
+    assert (tmp_path / 'sdk' / 'top' / 'docs' / 'z').read_bytes() == b'z'
+    assert (tmp_path / 'sdk' / 'notes.txt').exists()
+
+
+def test_concurrent_streams_need_no_executor_workers(tmp_path, range_server):
+    # Each archive is larger than the hand-off queue, so feeders have to wait for room
+    archives = {f'{i}.tar': _tar({f'sdk{i}/bin/x': os.urandom(6 * 1024 * 1024), f'sdk{i}/y': b'y'})
+                for i in range(4)}
+    server = range_server(archives)
+
+    async def install_all():
+        asyncio.get_running_loop().set_default_executor(concurrent.futures.ThreadPoolExecutor(1))
+        return await asyncio.wait_for(asyncio.gather(*(
+            archive.stream_extract_tar_async(server.url(name), tmp_path / name, name) for name in archives
+        )), timeout=60)
+
+    assert all(success for success, _ in asyncio.run(install_all()))
+    assert not list(tmp_path.rglob('*.tmp'))
@@ -0,0 +1,30 @@
+"""Tests for the download cache"""
+
+import json
+import hashlib
+import multiprocessing
+
+import pytest
+
+from devmatic.utils import cache
+
+
+def _store_many(worker: int, directory):
+    for i in range(25):
+        path = directory / f'{worker}-{i}.bin'
+        path.write_bytes(path.name.encode())
+        cache.store_cached_file(path, hashlib.sha256(path.read_bytes()).hexdigest(), f'https://example.com/{path.name}')
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_processes_keep_every_index_entry(tmp_path, cache_dir):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_store_many, args=(worker, tmp_path)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    index = json.loads((cache_dir / 'index.json').read_text())
+    assert len(index) == 4 * 25
+    assert not list(cache_dir.glob('*.tmp'))
@@ -0,0 +1,147 @@
+"""Tests for segmented, mirrored and resumable downloads"""
+
+import os
+import asyncio
+import hashlib
+
+from devmatic.utils import download
+
+SIZE = 9 * 1024 * 1024 + 123  # A few segments and an uneven tail
+
+
+def _download(url, destination, data, **options):
+    options.setdefault('use_cache', False)
+    return asyncio.run(download.download_file_async(
+        url, destination, 'test', hashlib.sha256(data).hexdigest(), **options))
+
+
+def _ranged(server):
+    return [entry for entry in server.log if entry[0] == 'GET' and entry[2]]
+
+
+def test_segmented_download(tmp_path, range_server):
+    data = os.urandom(SIZE)
+    server = range_server({'f.bin': data})
+    assert _download(server.url('f.bin'), tmp_path / 'f.bin', data)
+    assert (tmp_path / 'f.bin').read_bytes() == data
+    assert len(_ranged(server)) > 1
+    assert not (tmp_path / 'f.bin.part').exists()
+
+
+def test_server_without_ranges_streams(tmp_path, range_server):
+    data = os.urandom(SIZE)
+    server = range_server({'f.bin': data}, ranges=False)
+    assert _download(server.url('f.bin'), tmp_path / 'f.bin', data)
+    assert (tmp_path / 'f.bin').read_bytes() == data
+
+
+def test_advertised_ranges_ignored_falls_back(tmp_path, range_server):
+    data = os.urandom(SIZE)
+    server = range_server({'f.bin': data}, ranges=False, advertise=True)
+    assert _download(server.url('f.bin'), tmp_path / 'f.bin', data)
+    assert (tmp_path / 'f.bin').read_bytes() == data
+    assert not (tmp_path / 'f.bin.part.json').exists()
+
+
+def test_mirrors_are_striped(tmp_path, range_server):
+    data = os.urandom(SIZE)
+    primary = range_server({'f.bin': data})
+    mirror = range_server({'f.bin': data})
+    assert _download(primary.url('f.bin'), tmp_path / 'f.bin', data, mirrors=[mirror.url('f.bin')])
+    assert (tmp_path / 'f.bin').read_bytes() == data
+    # Beyond the tail sample, both hosts served segments
+    assert len(_ranged(primary)) > 1 and len(_ranged(mirror)) > 1
+
+
+def test_disagreeing_mirror_is_skipped(tmp_path, range_server):
+    data = os.urandom(SIZE)
+    primary = range_server({'f.bin': data})
+    good = range_server({'f.bin': data})
+    bad = range_server({'f.bin': data[:-10] + b'x' * 10})
+    mirrors = [good.url('f.bin'), bad.url('f.bin')]
+    assert _download(primary.url('f.bin'), tmp_path / 'f.bin', data, mirrors=mirrors)
+    assert (tmp_path / 'f.bin').read_bytes() == data
+    assert len(_ranged(bad)) == 1  # Only the tail sample
+
+
+def test_dropped_ranges_are_retried(tmp_path, range_server):
+    data = os.urandom(SIZE)
+    server = range_server({'f.bin': data}, drops=3, drop_after=100000)
+    assert _download(server.url('f.bin'), tmp_path / 'f.bin', data)
+    assert (tmp_path / 'f.bin').read_bytes() == data
+    assert server.drops == 0
+
+
+def test_interrupted_download_resumes(tmp_path, range_server, monkeypatch):
+    data = os.urandom(SIZE)
+    monkeypatch.setattr(download, 'RANGE_RETRIES', 0)
+    monkeypatch.setattr(download, 'RETRY_BUDGET', 0)
+    server = range_server({'f.bin': data}, drops=100, drop_after=1024 * 1024)
+    destination = tmp_path / 'f.bin'
+    assert not _download(server.url('f.bin'), destination, data)
+    assert (tmp_path / 'f.bin.part').exists() and (tmp_path / 'f.bin.part.json').exists()
+    
+    server.drops = 0
+    server.log.clear()
+    assert _download(server.url('f.bin'), destination, data)
+    assert destination.read_bytes() == data
+    # The bytes received before the interruption were not requested again
+    assert all(not header.startswith('bytes=0-') for _, _, header in _ranged(server))
+
+
+def test_corrupt_download_is_not_kept(tmp_path, range_server):
+    data = os.urandom(SIZE)
+    server = range_server({'f.bin': data})
+    assert not asyncio.run(download.download_file_async(
+        server.url('f.bin'), tmp_path / 'f.bin', 'test', '0' * 64, use_cache=False))
+    assert not any(tmp_path.iterdir())
+
+
+def test_bandwidth_timer_is_never_armed_twice():
+    async def run():
+        loop = asyncio.get_running_loop()
+        budget = download.DownloadBudget(max_bandwidth=10_000_000)
+        pending = []
+        most = 0
+        call_later = loop.call_later
+
+        def counting_call_later(delay, callback, *args):
+            nonlocal most
+            if getattr(callback, '__self__', None) is not budget:
+                return call_later(delay, callback, *args)
+            pending.append(callback)
+            most = max(most, len(pending))
+            return call_later(delay, lambda: (pending.remove(callback), callback()))
+
+        loop.call_later = counting_call_later
+        await budget.throttle(10_000_000)
+
+        async def waiter(i):
+            await asyncio.sleep(i * 0.001)
+            await budget.throttle(500_000)
+
+        # Waiters queue while a timer is already armed
+        await asyncio.gather(*(waiter(i) for i in range(20)))
+        return most
+
+    assert asyncio.run(run()) == 1
+
+
+def test_probes_and_samples_hold_budget_slots(tmp_path, range_server, monkeypatch):
+    data = os.urandom(SIZE)
+    servers = [range_server({'f.bin': data}) for _ in range(3)]
+    budget = download.DownloadBudget(max_connections=1)
+    monkeypatch.setattr(download, '_budget', budget)
+    held = []
+    acquire = budget._acquire
+
+    async def counting_acquire(priority):
+        await acquire(priority)
+        held.append(budget._in_use)
+
+    monkeypatch.setattr(budget, '_acquire', counting_acquire)
+    assert _download(servers[0].url('f.bin'), tmp_path / 'f.bin', data,
+                     mirrors=[server.url('f.bin') for server in servers[1:]])
+    # Every HEAD and tail sample went through the single slot
+    requests = sum(len(server.log) for server in servers)
+    assert len(held) >= requests and max(held) == 1
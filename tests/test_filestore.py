@@ -0,0 +1,41 @@
+"""Tests for the deduplicated file store"""
+
+import os
+import zlib
+
+from devmatic.utils import filestore
+from devmatic.utils.filestore import FileStore
+
+
+def test_link_checks_blob_content(tmp_path):
+    store = FileStore(tmp_path / 'store')
+    data = b'shared library' * 100
+    crc = zlib.crc32(data)
+    first = tmp_path / 'a.dll'
+    first.write_bytes(data)
+    store.adopt(first, 'ab' * 32, crc, len(data))
+
+    assert store.link_existing(crc, len(data), tmp_path / 'b.dll') == 'ab' * 32
+    assert (tmp_path / 'b.dll').read_bytes() == data
+
+    # An in-place edit of a linked tree changes the blob too; it must not spread
+    stat = first.stat()
+    with open(first, 'r+b') as f:
+        f.write(b'X')
+    os.utime(first, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert store.link_existing(crc, len(data), tmp_path / 'c.dll') is None
+    assert not (tmp_path / 'c.dll').exists()
+
+
+def test_unchanged_blob_is_not_read_again(tmp_path, monkeypatch):
+    store = FileStore(tmp_path / 'store')
+    data = b'runtime' * 1000
+    crc = zlib.crc32(data)
+    (tmp_path / 'a.dll').write_bytes(data)
+    store.adopt(tmp_path / 'a.dll', 'cd' * 32, crc, len(data))
+
+    reads = []
+    monkeypatch.setattr(filestore, '_blob_crc', lambda blob: reads.append(blob))
+    for i in range(3):
+        assert store.link_existing(crc, len(data), tmp_path / f'{i}.dll') == 'cd' * 32
+    assert reads == []
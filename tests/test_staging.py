@@ -0,0 +1,66 @@
+"""Tests for staged installs and upgrades"""
+
+import io
+import os
+import zipfile
+
+from devmatic.utils import archive, staging, store
+from devmatic.utils.manifest import complete_manifest
+
+
+def _zip(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_clone_shares_files(tmp_path):
+    previous = tmp_path / '1.0'
+    (previous / 'bin').mkdir(parents=True)
+    (previous / 'bin' / 'tool').write_bytes(b'old')
+
+    cloned = staging.create_staging_dir(tmp_path / '1.0', clone_from=previous)
+    assert (cloned / 'bin' / 'tool').stat().st_ino == (previous / 'bin' / 'tool').stat().st_ino
+
+
+def test_side_by_side_upgrade_writes_each_byte_once(tmp_path, monkeypatch):
+    old = {f'sdk/lib/{i}.dll': os.urandom(10000) for i in range(10)}
+    old['sdk/readme.txt'] = b'sdk'
+    new = dict(old, **{'sdk/lib/0.dll': os.urandom(12000), 'sdk/bin/new.exe': os.urandom(3000)})
+    del new['sdk/lib/9.dll']
+    (tmp_path / 'old.zip').write_bytes(_zip(old))
+    (tmp_path / 'new.zip').write_bytes(_zip(new))
+    previous_dir = tmp_path / '1.0'
+    previous_dir.mkdir()
+    previous = complete_manifest(previous_dir, archive.extract_zip(tmp_path / 'old.zip', previous_dir)[0])
+
+    copied = []
+    copy_unchanged = archive.copy_unchanged
+    monkeypatch.setattr(archive, 'copy_unchanged', lambda *args: copied.append(copy_unchanged(*args)))
+    extracted = []
+    target = staging.create_staging_dir(tmp_path / '2.0')
+    files, written, removed = archive.extract_zip(
+        tmp_path / 'new.zip', target, previous=previous, previous_dir=previous_dir,
+        on_progress=lambda completed, total: extracted.append(completed))
+
+    # Changed and added members come from the archive, the rest is copied once
+    assert (written, removed) == (2, 1)
+    assert extracted[-1] == 12000 + 3000
+    assert copied == [8 * 10000 + 3]
+    assert sorted(files) == sorted(name[len('sdk/'):] for name in new)
+    # The versions are independent copies
+    (target / 'lib' / '1.dll').write_bytes(b'edited')
+    assert (previous_dir / 'lib' / '1.dll').read_bytes() == old['sdk/lib/1.dll']
+
+
+def test_stale_versions_keep_the_active_and_most_recent(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'SDK_DIR', tmp_path)
+    for i, version in enumerate(['1.0', '2.0', '3.0', '4.0']):
+        store.version_dir('go', version).mkdir(parents=True)
+        os.utime(store.version_dir('go', version), (i, i))
+    store.set_current_version('go', '2.0')
+
+    assert store.stale_versions('go', keep=1) == ['3.0', '1.0']
+    assert store.stale_versions('go', keep=0) == ['4.0', '3.0', '1.0']
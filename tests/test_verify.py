@@ -0,0 +1,45 @@
+"""Tests for verifying and repairing installed SDKs"""
+
+import io
+import os
+import asyncio
+import tarfile
+
+from devmatic.utils import archive, manifest, staging, store, verify
+
+
+def _tar(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tf:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def test_repair_streams_damaged_tar_members(tmp_path, range_server, cache_dir, monkeypatch):
+    monkeypatch.setattr(store, 'SDK_DIR', tmp_path / 'sdk')
+    monkeypatch.setattr(manifest, 'MANIFEST_DIR', tmp_path / 'manifests')
+    monkeypatch.setattr(staging, 'TRASH_DIR', tmp_path / 'trash')
+    files = {f'node/lib/{i}.js': os.urandom(2000) for i in range(5)}
+    files['node/bin/node.exe'] = os.urandom(5000)
+    server = range_server({'node.tar.gz': _tar(files)})
+    url = server.url('node.tar.gz')
+
+    directory = store.version_dir('node', '20.0')
+    assert asyncio.run(archive.stream_extract_tar_async(url, directory, 'node'))[0]
+    store.set_current_version('node', '20.0')
+    manifest.save_install_manifest('node', '20.0', manifest.scan_tree(directory), url)
+
+    (directory / 'lib' / '3.js').write_bytes(b'broken')
+    (directory / 'bin' / 'node.exe').unlink()
+    assert not verify.verify_sdks(['node'])
+
+    assert verify.verify_sdks(['node'], repair=True)
+    assert (directory / 'lib' / '3.js').read_bytes() == files['node/lib/3.js']
+    assert (directory / 'bin' / 'node.exe').read_bytes() == files['node/bin/node.exe']
+    # Untouched files stay as they were, and the scratch folder is gone
+    assert (directory / 'lib' / '0.js').read_bytes() == files['node/lib/0.js']
+    assert not (directory.parent / '.20.0.repair').exists()
+    assert verify.verify_sdks(['node'], deep=True)